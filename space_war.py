@@ -1,66 +1,126 @@
 # Space Invaders
 # By Adam Kilbourne-Quirk 2020-02-22
 
-import os, sys, time, psutil, queue
+import os, time, psutil, queue
+import csv, json, argparse, collections, heapq, itertools
 import math, random
-import turtle
+import turtle, tkinter
+import numpy as np
 
-class Sprite(turtle.Turtle):
+class Sprite():
+	'''
+	Simulation state for anything on the field. Positions, headings and sizes are plain attributes so the game can
+	run without a display; the method names follow turtle so a Renderer can mirror them onto the screen.
+
+	The unit heading vector (hx, hy) is kept alongside the heading and only recomputed when the sprite turns, so
+	moving and the geometry helpers don't redo the trig on every call.
+	'''
 	def __init__(self, shape, color, start_x, start_y, start_hdg):
-		turtle.Turtle.__init__(self, shape = shape)
-		self.color(color)
-		self.penup()
+		self.shape = shape
+		self.current_color = color
+		self.stretch = (1, 1)
+		self.visible = True
 
 		self.goto(start_x, start_y)
 		self.setheading(start_hdg)
 		self.size = 10 # used for collisions
 
+	def xcor(self):
+		return self.x
+
+	def ycor(self):
+		return self.y
+
+	def heading(self):
+		return self.hdg
+
+	def goto(self, x, y):
+		# a jump isn't drawn as movement, so the previous position jumps along with it
+		self.x = self.prev_x = x
+		self.y = self.prev_y = y
+
+	def setheading(self, hdg):
+		self.hdg = hdg % 360
+		self.hx = math.cos(math.pi / 180 * self.hdg)
+		self.hy = math.sin(math.pi / 180 * self.hdg)
+
+	def fd(self, distance):
+		self.x += distance * self.hx
+		self.y += distance * self.hy
+
+	def lt(self, angle):
+		self.setheading(self.hdg + angle)
+
+	def rt(self, angle):
+		self.setheading(self.hdg - angle)
+
+	def color(self, color):
+		self.current_color = color
+
+	def ht(self):
+		self.visible = False
+
+	def st(self):
+		self.visible = True
+
+	def shapesize(self, stretch_wid=1, stretch_len=1, outline=None):
+		self.stretch = (stretch_wid, stretch_len)
+
+	def save_pos(self):
+		self.prev_x = self.x
+		self.prev_y = self.y
+
+	def lerp_pos(self, alpha):
+		'''
+		Position part way (alpha = 0..1) from the previous tick to the current one, for drawing between ticks.
+		'''
+		return self.prev_x + (self.x - self.prev_x) * alpha, self.prev_y + (self.y - self.prev_y) * alpha
+
 	def distance(self, x, y):
-		x1 = self.xcor()
-		y1 = self.ycor()
-		return ((x - x1)**2 + (y - y1)**2)**0.5
+		return ((x - self.x)**2 + (y - self.y)**2)**0.5
 
 	def bearing(self, x, y):
-		x1 = self.xcor()
-		y1 = self.ycor()
-		return (math.atan2(y - y1, x - x1))*180/math.pi
+		return (math.atan2(y - self.y, x - self.x))*180/math.pi
 
-	def brg_error(self, x, y):
+	def sin_brg_error(self, x, y):
 		'''
 		use the cross product to a) avoid discontinuity at +/- 180 and b) take the sign/pointing direction into account
 		sin(C) = cross(a, b) / [mag(a) * mag(b)]
 		'''
-		x1 = math.cos(math.pi / 180 * self.heading())
-		y1 = math.sin(math.pi / 180 * self.heading())
-		x2 = x - self.xcor()
-		y2 = y - self.ycor()
-		dist = self.distance(x, y)
+		x2 = x - self.x
+		y2 = y - self.y
+		dist = (x2**2 + y2**2)**0.5
 		if dist == 0:
-			sin_C = 0
-		else:
-			sin_C = (x1 * y2 - x2 * y1) / dist
+			return 0
+		# floating point can put the ratio a hair outside [-1, 1]
+		return max(min((self.hx * y2 - x2 * self.hy) / dist, 1), -1)
 
-		return math.asin(sin_C) * 180 / math.pi
+	def brg_error(self, x, y):
+		return math.asin(self.sin_brg_error(x, y)) * 180 / math.pi
 
 	def is_collided(self, other):
 		bounds = self.size + other.size
 		# check bounding box
-		if (self.xcor() - other.xcor() < bounds) or (self.ycor() - other.ycor() < bounds):
+		if (self.x - other.x < bounds) or (self.y - other.y < bounds):
 			# check more precisely
-			if self.distance(other.xcor(), other.ycor()) < bounds:
+			if self.distance(other.x, other.y) < bounds:
 				return True
 		return False
 
 class Actor(Sprite):
-	def __init__(self, shape, color, start_x, start_y, start_hdg=0, speed=0, max_turn_speed=0):
+	'''
+	A sprite that moves under its own power. Actors belong to one game, which they reach through self.game.
+	'''
+	def __init__(self, game, shape, color, start_x, start_y, start_hdg=0, speed=0, max_turn_speed=0):
+		self.game = game
 		Sprite.__init__(self, shape, color, start_x, start_y, start_hdg)
 		self.speed = speed
 		self.max_turn_speed = max_turn_speed
 
 	def move(self):
 		# boundaries
-		bx = game.border_size_x
-		by = game.border_size_y
+		bx = self.game.border_size_x
+		by = self.game.border_size_y
 
 		if not (-bx < self.xcor() < bx) or not (-by < self.ycor() < by):
 			self.respawn()
@@ -68,36 +128,42 @@ class Actor(Sprite):
 		self.fd(self.speed)
 
 	def respawn(self):
-		self.penup()
-		self.clear()
 		while True:
-			bx = game.border_size_x - self.size
-			by = game.border_size_y - self.size
-			x = random.randint(-bx, bx)
-			y = random.randint(-by, by)
-			if player.distance(x, y) > game.border_size_y/4:
+			bx = self.game.border_size_x - self.size
+			by = self.game.border_size_y - self.size
+			x = self.game.rng.randint(-bx, bx)
+			y = self.game.rng.randint(-by, by)
+			if self.game.player.distance(x, y) > self.game.border_size_y/4:
 				break
 		self.goto(x, y)
-		self.setheading(random.randint(0, 360))
+		self.setheading(self.game.rng.randint(0, 360))
 
 	def closing_speed(self, actor):
 		'''
 		This function requires a speed attribute, which is why it isn't in the Sprite class
 		v_close = dot(v_rel, d_rel)/mag(d_rel)
 		'''
-		v1x = self.speed * math.cos(math.pi / 180 * self.heading())
-		v1y = self.speed * math.sin(math.pi / 180 * self.heading())
-		v2x = actor.speed * math.cos(math.pi / 180 * actor.heading())
-		v2y = actor.speed * math.sin(math.pi / 180 * actor.heading())
-		dx = actor.xcor() - self.xcor()
-		dy = actor.ycor() - self.ycor()
+		v1x = self.speed * self.hx
+		v1y = self.speed * self.hy
+		v2x = actor.speed * actor.hx
+		v2y = actor.speed * actor.hy
+		dx = actor.x - self.x
+		dy = actor.y - self.y
 		vx = v2x - v1x
 		vy = v2y - v1y
-		return (vx * dx + vy * dy)/self.distance(actor.xcor(), actor.ycor())
+		return (vx * dx + vy * dy)/self.distance(actor.x, actor.y)
 
 class Player(Actor):
-	def __init__(self, shape, color, start_x, start_y, start_hdg, speed=4, max_turn_speed=22.5):
-		Actor.__init__(self, shape, color, start_x, start_y, start_hdg, speed, max_turn_speed)
+	flash_interval = 0.2
+	# autopilot tuning
+	low_lives = 1 # at or below this, go for the prize
+	retarget_ticks = 15
+	avoidance = 8
+	fire_error = 8 # degrees
+	bomb_threat = 1
+
+	def __init__(self, game, shape, color, start_x, start_y, start_hdg, speed=4, max_turn_speed=22.5):
+		Actor.__init__(self, game, shape, color, start_x, start_y, start_hdg, speed, max_turn_speed)
 		self.start_loc = (start_x, start_y, start_hdg)
 		self.start_color = color
 		self.max_fwd_speed = 10
@@ -114,42 +180,77 @@ class Player(Actor):
 		self.is_invuln = False
 		self.time_since_invuln = float('-inf')
 		self.time_invuln = 0
+		self.time_flash = float('-inf')
+		self.on_autopilot = False
+		self.quarry = None
+		self.time_retarget = 0
+
+	def toggle_autopilot(self):
+		self.on_autopilot = not self.on_autopilot
 
 	def autopilot(self):
 		'''
-		Will implement in pygame version of this game. Does the following:
-		- If number of lives are below a threshold, navigate to the prize.
-		- If above threshold, hunt down enemies
-		- Avoid collision with hotwalls and enemies.
-		- If enemy collision imminent, or average distance to enemies is low, use a bomb
+		Flies the player off the game's ThreatField, so a decision costs the same however many walls and enemies
+		there are:
+		- At or below low_lives lives, head for the prize. Otherwise hunt the nearest enemy, picked again every
+		  retarget_ticks ticks.
+		- Steer down the slope of the field, away from enemies and (most of all) hot walls.
+		- Fire when lined up with the quarry; bomb when enemies crowd in.
 		'''
-		pass
+		game = self.game
+		field = game.threat_field
+		field.refresh()
+		if self.lives <= Player.low_lives and game.prize:
+			goal = game.prize
+		else:
+			if self.quarry is None or game.clock.ticks >= self.time_retarget:
+				enemies = [actor for actor in game.actors if isinstance(actor, Enemy)]
+				self.quarry = min(enemies, key=lambda e: self.distance(e.x, e.y)) if enemies else None
+				self.time_retarget = game.clock.ticks + Player.retarget_ticks
+			goal = self.quarry
+		if goal is None:
+			return
+
+		dist = max(self.distance(goal.x, goal.y), 1e-6)
+		gx, gy = field.gradient(self.x, self.y)
+		vx = (goal.x - self.x) / dist - Player.avoidance * gx
+		vy = (goal.y - self.y) / dist - Player.avoidance * gy
+		turn = self.brg_error(self.x + vx, self.y + vy)
+		self.lt(max(min(self.max_turn_speed, turn), -self.max_turn_speed))
+
+		# ease off where it's crowded, and when closing in on something to shoot
+		cruise = 3 if field.potential(self.x, self.y) > 1 or (goal is self.quarry and dist < 200) else 6
+		if self.speed < cruise:
+			self.accel()
+		elif self.speed > cruise:
+			self.decel()
+
+		if field.enemy_threat(self.x, self.y) > Player.bomb_threat and not self.is_invuln:
+			self.bomb()
+		elif goal is self.quarry and abs(self.brg_error(goal.x, goal.y)) < Player.fire_error:
+			self.fire_bullet()
 
 	def fire_bullet(self):
-		if time.time() - self.time_since_fire > 1/max(self.rof, 1e-6):
-			self.time_since_fire = time.time()
+		if self.game.clock.time() - self.time_since_fire > 1/max(self.rof, 1e-6):
+			self.time_since_fire = self.game.clock.time()
 			bullet_speed = self.speed + self.bullet_speed
-			bullet = Bullet("triangle", "yellow", self.xcor(), self.ycor(), self.heading(), bullet_speed)
-			bullet.fire()
+			self.game.bullets.spawn("triangle", "yellow", self.xcor(), self.ycor(), self.heading(), bullet_speed)
 
 	def bomb(self):
 		if self.bombs < 1:
 			return
-		if time.time() - self.time_since_fire > 1/max(self.rof, 1e-6):
-			self.time_since_fire = time.time()
-			for fragment in range(0, 360, 10):
-				bullet = Bullet("triangle", "yellow", self.xcor(), self.ycor(), fragment, self.bullet_speed)
-				bullet.fire()
+		if self.game.clock.time() - self.time_since_fire > 1/max(self.rof, 1e-6):
+			self.time_since_fire = self.game.clock.time()
+			self.game.bullets.spawn_many("triangle", "yellow", self.xcor(), self.ycor(), range(0, 360, 10), self.bullet_speed)
 			self.bombs -= 1
-			game.show_score()
+			self.game.show_score()
 
 	def fire_bounce(self):
-		if time.time() - self.time_since_fire > 1/max(self.rof, 1e-6):
-			self.time_since_fire = time.time()
+		if self.game.clock.time() - self.time_since_fire > 1/max(self.rof, 1e-6):
+			self.time_since_fire = self.game.clock.time()
 			bullet_speed = self.speed + self.bullet_speed/2
-			bullet = Bullet("circle", "magenta", self.xcor(), self.ycor(), self.heading(), bullet_speed,
-							self.bullet_bounces)
-			bullet.fire()
+			self.game.bullets.spawn("circle", "magenta", self.xcor(), self.ycor(), self.heading(), bullet_speed,
+							   self.bullet_bounces)
 
 	def turn_left(self):
 		self.lt(self.max_turn_speed)
@@ -168,74 +269,80 @@ class Player(Actor):
 	def increment_lives(self, lives, set_invuln=True):
 		if lives > 0 or (lives < 0 and not self.is_invuln) or not set_invuln:
 			self.lives += lives
-		if self.lives < 1 and game.options["player_can_die"]:
-			game.reset_game()
+		if self.lives < 1 and self.game.options["player_can_die"]:
+			self.game.reset_game()
 		if set_invuln:
 			self.invuln_on(3)
-		game.show_score()
+		self.game.show_score()
 
 	def invuln_on(self, seconds):
+		timers = self.game.timers
 		if not self.is_invuln:
-			self.time_since_invuln = time.time()
+			self.time_since_invuln = self.time_flash = self.game.clock.time()
+			timers.schedule((self, "flash"), self.time_flash + Player.flash_interval/2, self.flash)
 		self.is_invuln = True
 		self.time_invuln = seconds
+		# counted from when invulnerability began, even when topped up
+		timers.schedule((self, "invuln"), self.time_since_invuln + seconds, self.invuln_off)
 
 	def invuln_off(self):
-		flash_interval = 0.2
-		if not self.is_invuln:
-			return
-		elif time.time() - self.time_since_invuln > self.time_invuln:
-			self.is_invuln = False
-			self.time_invuln = 0
-			self.color(self.start_color)
-		elif (time.time() - self.time_since_invuln) % flash_interval > flash_interval/2:
-			self.color("black")
-		else:
-			self.color(self.start_color)
+		self.is_invuln = False
+		self.time_invuln = 0
+		self.game.timers.cancel((self, "flash"))
+		self.color(self.start_color)
+
+	def flash(self):
+		# black for the second half of every flash interval while invulnerable
+		self.color("black" if self.current_color == self.start_color else self.start_color)
+		self.time_flash += Player.flash_interval/2
+		self.game.timers.schedule((self, "flash"), self.time_flash + Player.flash_interval/2, self.flash)
 
 	def respawn(self):
-		self.penup()
-		self.clear()
 		self.goto(self.start_loc[0], self.start_loc[1])
 		self.setheading(self.start_loc[2])
 
 class Enemy(Actor):
-	def __init__(self, shape="square", color="red", start_x=0, start_y=0, start_hdg=0, speed=4, max_turn_speed=5):
-		Actor.__init__(self, shape, color, start_x, start_y, start_hdg, speed, max_turn_speed)
-		self.color_dict = {0: "green", 1: "lightgreen", 2: "orange red", 3: "red", 4: "brown", 5: "blue"}
-		self.aim_pt = turtle.Turtle()
-		self.aim_pt.color("white")
-		self.aim_pt.ht()
-		self.bx = game.border_size_x - self.size
-		self.by = game.border_size_y - self.size
+	color_dict = {0: "green", 1: "lightgreen", 2: "orange red", 3: "red", 4: "brown", 5: "blue"}
+
+	def __init__(self, game, shape="square", color="red", start_x=0, start_y=0, start_hdg=0, speed=4,
+				 max_turn_speed=5):
+		Actor.__init__(self, game, shape, color, start_x, start_y, start_hdg, speed, max_turn_speed)
+		self.bx = self.game.border_size_x - self.size
+		self.by = self.game.border_size_y - self.size
 
-		self.target = player
+		self.target = self.game.player
 
 		# target a random actor, for giggles
-		if game.options["all_enemies_aim_rand"]:
-			self.target = random.choice(game.get_actors())
+		if self.game.options["all_enemies_aim_rand"]:
+			self.target = self.game.rng.choice(self.game.get_actors())
 		self.guidance = 0
 		self.random_steps = 0
 		self.ax = self.xcor()
 		self.ay = self.ycor()
-		self.ax_rand = random.randint(-bx, bx)
-		self.ay_rand = random.randint(-by, by)
+		self.ax_rand = self.game.rng.randint(-self.bx, self.bx)
+		self.ay_rand = self.game.rng.randint(-self.by, self.by)
 		self.scattered = False
 		self.time_since_scatter = float('-inf')
 		self.time_scatter = 0
 
 	def set_guidance(self, guidance_mode):
 		self.guidance = guidance_mode
-		self.color(self.color_dict[guidance_mode % len(self.color_dict)])
+		self.color(Enemy.color_dict[guidance_mode % len(Enemy.color_dict)])
 
 	def scatter(self, t):
 		self.time_scatter = t
-		self.time_since_scatter = time.time()
+		self.time_since_scatter = self.game.clock.time()
 		if not self.scattered:
 			self.start_guidance = self.guidance
 			self.scattered = True
 			self.set_guidance(5)
 			self.speed *= 0.5
+		self.game.timers.schedule((self, "scatter"), self.time_since_scatter + t, self.end_scatter)
+
+	def end_scatter(self):
+		self.set_guidance(self.start_guidance)
+		self.scattered = False
+		self.speed *= 2
 
 	def update_aim_pt(self):
 		'''
@@ -247,24 +354,19 @@ class Enemy(Actor):
 		4: Mirror. Moves to opposite side of space from player.
 		5: Avoidance. Moves away from player.
 		'''
-		if game.options["all_enemies_speed_match"]:
-			self.speed = abs(player.speed)
-
-		# stop scattering
-		if self.scattered and time.time() - self.time_since_scatter > self.time_scatter:
-			self.set_guidance(self.start_guidance)
-			self.scattered = False
-			self.speed *= 2
-		px = self.target.xcor()
-		py = self.target.ycor()
-		ax = self.xcor()
-		ay = self.ycor()
+		if self.game.options["all_enemies_speed_match"]:
+			self.speed = abs(self.game.player.speed)
+
+		px = self.target.x
+		py = self.target.y
+		ax = self.x
+		ay = self.y
 
 		if self.guidance == 1:
 			self.random_steps = (self.random_steps + 1) % 50
 			if self.random_steps == 0:
-				self.ax_rand = random.randint(-self.bx, self.bx)
-				self.ay_rand = random.randint(-self.by, self.by)
+				self.ax_rand = self.game.rng.randint(-self.bx, self.bx)
+				self.ay_rand = self.game.rng.randint(-self.by, self.by)
 			ax = self.ax_rand
 			ay = self.ay_rand
 		elif self.guidance == 2:
@@ -302,14 +404,16 @@ class Enemy(Actor):
 			aim_dist = 0
 
 			# if player is not moving, aim directly at it
-			if abs(N) > 0:
+			if abs(N) > 1e-6:
 				c0 = -(p_dist ** 2)
-				c1 = 2 * p_dist * math.cos(math.pi / 180 * self.target.brg_error(ax, ay))
+				# cos(asin(s)) == sqrt(1 - s**2), since asin stays within +/- 90 degrees
+				c1 = 2 * p_dist * (1 - self.target.sin_brg_error(ax, ay)**2)**0.5
 				c2 = 1/(N**2) - 1
 
 				# N == +/-1; edge case
 				if abs(c2) < 1e-6:
-					aim_dist = -c0 / c1
+					# no intercept when the target moves straight across; aim at it
+					aim_dist = -c0 / c1 if c1 else 0
 				else:
 					temp = c1**2 - 4 * c2 * c0
 					# avoid complex numbers
@@ -320,8 +424,8 @@ class Enemy(Actor):
 				if self.target.speed < 0:
 					aim_dist *= -1
 
-			ax = px + math.cos(math.pi / 180 * self.target.heading()) * aim_dist
-			ay = py + math.sin(math.pi / 180 * self.target.heading()) * aim_dist
+			ax = px + self.target.hx * aim_dist
+			ay = py + self.target.hy * aim_dist
 
 		elif self.guidance == 4:
 			'''
@@ -337,69 +441,159 @@ class Enemy(Actor):
 			ax = 2 * ax - px
 			ay = 2 * ay - py
 
+		if self.guidance in (2, 3) and self.game.options["flow_field_guidance"]:
+			ax, ay = self.game.flow_field.steer(self.target, self.x, self.y, ax, ay)
+
 		self.ax = max(min(self.bx, ax), -self.bx)
 		self.ay = max(min(self.by, ay), -self.by)
-		if game.options["show_aim_pts"]:
-			self.draw_aim_pt(self.ax, self.ay)
-
 
 	def autopilot(self):
 		command = 0.5 * self.brg_error(self.ax, self.ay)
 		self.lt(max(min(self.max_turn_speed, command), -self.max_turn_speed))
 
-	def draw_aim_pt(self, ax, ay):
-		self.aim_pt.goto(ax, ay)
-		self.aim_pt.clear()
-		self.aim_pt.dot()
-
 	def respawn(self):
-		if game.options["all_enemies_aim_rand"]:
-			self.target = random.choice(game.get_actors())
+		if self.game.options["all_enemies_aim_rand"]:
+			self.target = self.game.rng.choice(self.game.get_actors())
 		super().respawn()
 
+def update_aim_pts(game, enemies):
+	'''
+	Enemy.update_aim_pt for a whole list of enemies at once. Every guidance mode is worked out for every enemy with
+	NumPy and each enemy keeps the one it uses, so the cost barely grows with the number of enemies.
+	'''
+	if not enemies:
+		return
+	for e in enemies:
+		if game.options["all_enemies_speed_match"]:
+			e.speed = abs(game.player.speed)
+		if e.guidance == 1:
+			# same draws, in the same order, as the scalar path
+			e.random_steps = (e.random_steps + 1) % 50
+			if e.random_steps == 0:
+				e.ax_rand = game.rng.randint(-e.bx, e.bx)
+				e.ay_rand = game.rng.randint(-e.by, e.by)
+
+	mode = np.array([e.guidance for e in enemies])
+	ex, ey, speed, ax_rand, ay_rand, bx, by = np.array(
+		[(e.x, e.y, e.speed, e.ax_rand, e.ay_rand, e.bx, e.by) for e in enemies], dtype=float).T
+	px, py, thx, thy, t_speed = np.array(
+		[(e.target.x, e.target.y, e.target.hx, e.target.hy, e.target.speed) for e in enemies], dtype=float).T
+
+	# pro-nav; see Enemy.update_aim_pt for the derivation
+	with np.errstate(divide="ignore", invalid="ignore"):
+		dx = ex - px
+		dy = ey - py
+		p_dist = np.hypot(dx, dy)
+		sin_C = np.where(p_dist == 0, 0, np.clip((thx * dy - dx * thy) / p_dist, -1, 1))
+		N = t_speed / np.maximum(speed, 1)
+		c0 = -(p_dist ** 2)
+		c1 = 2 * p_dist * np.sqrt(1 - sin_C**2)
+		c2 = 1/(N**2) - 1
+		temp = np.sqrt(np.maximum(c1**2 - 4 * c2 * c0, 0))
+		quadratic = np.maximum(np.minimum((-c1 + temp) / (2 * c2), (-c1 - temp) / (2 * c2)), 0)
+		aim_dist = np.where(np.abs(c2) < 1e-6, np.where(c1 == 0, 0, -c0 / c1), quadratic)
+	aim_dist = np.where(np.abs(N) <= 1e-6, 0, np.where(t_speed < 0, -aim_dist, aim_dist))
+
+	choices = [mode == 1, mode == 2, mode == 3, mode == 4, mode == 5]
+	ax = np.select(choices, [ax_rand, px, px + thx * aim_dist, -px, 2 * ex - px], ex)
+	ay = np.select(choices, [ay_rand, py, py + thy * aim_dist, -py, 2 * ey - py], ey)
+	if game.options["flow_field_guidance"]:
+		for k in np.flatnonzero((mode == 2) | (mode == 3)).tolist():
+			e = enemies[k]
+			ax[k], ay[k] = game.flow_field.steer(e.target, e.x, e.y, ax[k], ay[k])
+	ax = np.clip(ax, -bx, bx)
+	ay = np.clip(ay, -by, by)
+	for e, x, y in zip(enemies, ax.tolist(), ay.tolist()):
+		e.ax = x
+		e.ay = y
+
+def autopilot_all(game, enemies):
+	'''
+	Enemy.autopilot for a whole list of enemies at once: turn each toward its aim point, limited by its turn rate.
+	'''
+	if not enemies:
+		return
+	ex, ey, hx, hy, hdg, ax, ay, max_turn = np.array(
+		[(e.x, e.y, e.hx, e.hy, e.hdg, e.ax, e.ay, e.max_turn_speed) for e in enemies], dtype=float).T
+	dx = ax - ex
+	dy = ay - ey
+	dist = np.hypot(dx, dy)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		sin_C = np.where(dist == 0, 0, np.clip((hx * dy - dx * hy) / dist, -1, 1))
+	command = 0.5 * np.degrees(np.arcsin(sin_C))
+	hdg = (hdg + np.clip(command, -max_turn, max_turn)) % 360
+	rad = np.radians(hdg)
+	for e, h, x, y in zip(enemies, hdg.tolist(), np.cos(rad).tolist(), np.sin(rad).tolist()):
+		e.hdg = h
+		e.hx = x
+		e.hy = y
+
 class Prize(Actor):
-	def __init__(self, shape="circle", color="white", start_x=0, start_y=0):
-		Actor.__init__(self, shape, color, start_x, start_y)
+	def __init__(self, game, shape="circle", color="white", start_x=0, start_y=0):
+		Actor.__init__(self, game, shape, color, start_x, start_y)
 		self.time_since_respawn = float("-inf")
 		self.respawn_interval = 10
 
 	def scatter_enemies(self, t):
-		for e in game.get_actors():
+		for e in self.game.get_actors():
 			if isinstance(e, Enemy):
 				e.scatter(t)
 
 	def award(self):
-		player.increment_lives(1)
-		player.invuln_on(6)
+		self.game.player.increment_lives(1)
+		self.game.player.invuln_on(6)
 		self.scatter_enemies(6)
 		self.respawn()
 
-class Bullet(Sprite):
-	def __init__(self, shape, color, start_x, start_y, start_hdg, speed, bounces=0):
-		Sprite.__init__(self, shape, color, start_x, start_y, start_hdg)
-		self.shapesize(stretch_wid = 0.3, stretch_len = 0.4, outline=None)
-		self.speed = speed
-		self.bounces = bounces
-		self.size = 5
-		self.max_lifetime = 20
-		self.spawn_time = time.time()
-
-	def fire(self):
-		self.goto(player.xcor(), player.ycor())
-		game.bullets.append(self)
-
-	def move(self):
-		# boundaries
-		bx = game.border_size_x
-		by = game.border_size_y
+def pool_field(name):
+	'''
+	Property that reads and writes a bullet's slot in one of the ProjectilePool arrays.
+	'''
+	def get(self):
+		return getattr(self.pool, name)[self.index].item()
 
-		if time.time() - self.spawn_time > self.max_lifetime or not (-bx < self.xcor() < bx) or not (-by < self.ycor() < by):
-			self.__del__()
+	def set(self, value):
+		getattr(self.pool, name)[self.index] = value
 
-		self.fd(self.speed)
+	return property(get, set)
 
-	def bounces(self):
-		return self.bounces
+class Bullet(Sprite):
+	'''
+	Handle onto one slot of a ProjectilePool. The state lives in the pool's arrays so every bullet can be moved and
+	culled at once; the handle lets walls, enemies and renderers treat a bullet like any other sprite. Handles belong
+	to their slot and are reused along with it.
+	'''
+	size = 5
+	max_lifetime = 20
+	stretch = (0.3, 0.4)
+
+	x = pool_field("x")
+	y = pool_field("y")
+	prev_x = pool_field("prev_x")
+	prev_y = pool_field("prev_y")
+	hdg = pool_field("hdg")
+	speed = pool_field("speed")
+	bounces = pool_field("bounces")
+	spawn_time = pool_field("spawn_time")
+
+	def __init__(self, pool, index):
+		self.pool = pool
+		self.index = index
+		self.shape = "triangle"
+		self.current_color = "yellow"
+		self.visible = False
+
+	# the pool turns bullets by writing hdg directly, so the heading vector is worked out on demand instead
+	def setheading(self, hdg):
+		self.hdg = hdg % 360
+
+	@property
+	def hx(self):
+		return math.cos(math.pi / 180 * self.hdg)
+
+	@property
+	def hy(self):
+		return math.sin(math.pi / 180 * self.hdg)
 
 	def wall_hit(self, wall=None):
 		if wall and wall.bounce_mode < 4:
@@ -407,16 +601,130 @@ class Bullet(Sprite):
 		elif wall and wall.bounce_mode == 6:
 			self.bounces += 1
 		if self.bounces < 0:
-			self.__del__()
-
-	def __del__(self):
-		try:
-			self.reset()
-			game.bullets.remove(self)
-		except:
-			pass
+			self.pool.remove(self)
+
+class ProjectilePool():
+	'''
+	Fixed-capacity struct-of-arrays storage for bullets. step() advances, bounds-checks and expires every live bullet
+	with a handful of NumPy operations per tick, and a burst of fragments is a single spawn_many() call.
+
+	Free slots are kept on a stack, so taking or giving back a slot is O(1), and each slot keeps its Bullet handle for
+	the life of the pool: nothing is allocated or collected while the game runs. When every slot is taken, further
+	shots are dropped until one frees up.
+	'''
+	fields = {"x": float, "y": float, "prev_x": float, "prev_y": float, "hdg": float, "speed": float,
+			  "bounces": np.int64, "spawn_time": float, "active": bool}
+
+	def __init__(self, clock, capacity=512):
+		self.clock = clock
+		self.capacity = capacity
+		for name, dtype in ProjectilePool.fields.items():
+			setattr(self, name, np.zeros(capacity, dtype=dtype))
+		self.handles = [Bullet(self, i) for i in range(capacity)]
+		# popped from the end, so the lowest slots are handed out first
+		self.free = list(range(capacity - 1, -1, -1))
+		self.tests = 0
+
+	def spawn_many(self, shape, color, x, y, hdgs, speed, bounces=0):
+		hdgs = np.asarray(hdgs, dtype=float) % 360
+		n = min(len(hdgs), len(self.free))
+		if n == 0:
+			return []
+		slots = [self.free.pop() for _ in range(n)]
+		self.x[slots] = self.prev_x[slots] = x
+		self.y[slots] = self.prev_y[slots] = y
+		self.hdg[slots] = hdgs[:n]
+		self.speed[slots] = speed
+		self.bounces[slots] = bounces
+		self.spawn_time[slots] = self.clock.time()
+		self.active[slots] = True
+		bullets = [self.handles[i] for i in slots]
+		for bullet in bullets:
+			bullet.shape = shape
+			bullet.current_color = color
+			bullet.visible = True
+		return bullets
+
+	def spawn(self, shape, color, x, y, hdg, speed, bounces=0):
+		bullets = self.spawn_many(shape, color, x, y, [hdg], speed, bounces)
+		return bullets[0] if bullets else None
+
+	def step(self, now, bx, by):
+		'''
+		Expire bullets that are past their lifetime or out of bounds, then move the rest.
+		'''
+		expired = (now - self.spawn_time > Bullet.max_lifetime) | (np.abs(self.x) >= bx) | (np.abs(self.y) >= by)
+		for i in np.flatnonzero(self.active & expired).tolist():
+			self.remove(self.handles[i])
+
+		self.prev_x[:] = self.x
+		self.prev_y[:] = self.y
+		live = np.flatnonzero(self.active)
+		rad = self.hdg[live] * (math.pi / 180)
+		self.x[live] += self.speed[live] * np.cos(rad)
+		self.y[live] += self.speed[live] * np.sin(rad)
+
+	def hits(self, sprites, before=None, cell_size=None):
+		'''
+		Returns the (bullet, sprite) pairs that touched at any point during the last tick, earliest contact first. Both
+		bullets and sprites are swept from their previous to their current positions, so a fast bullet can't skip
+		over a sprite between ticks. before (one value per slot) drops contacts that come at or after that fraction
+		of a bullet's move, e.g. behind the wall it met first. With cell_size set, only bullets and sprites whose
+		swept boxes share a grid cell are tested (grid_pairs); otherwise every live bullet is tested against every
+		sprite. Either way the tests run in one broadcast and tests is left holding how many there were.
+		'''
+		self.tests = 0
+		live = np.flatnonzero(self.active)
+		if len(live) == 0 or len(sprites) == 0:
+			return []
+		sx = np.array([sprite.prev_x for sprite in sprites])
+		sy = np.array([sprite.prev_y for sprite in sprites])
+		sex = np.array([sprite.x for sprite in sprites]) - sx
+		sey = np.array([sprite.y for sprite in sprites]) - sy
+		bounds = np.array([sprite.size for sprite in sprites]) + Bullet.size
+		px = self.prev_x[live]
+		py = self.prev_y[live]
+		bex = self.x[live] - px
+		bey = self.y[live] - py
+		if cell_size:
+			# a sprite's box grows by the contact distance, so any contact puts the bullet inside it
+			b, j = grid_pairs((np.minimum(px, px + bex), np.minimum(py, py + bey), np.maximum(px, px + bex),
+							   np.maximum(py, py + bey)),
+							  (np.minimum(sx, sx + sex) - bounds, np.minimum(sy, sy + sey) - bounds,
+							   np.maximum(sx, sx + sex) + bounds, np.maximum(sy, sy + sey) + bounds), cell_size)
+		else:
+			b, j = np.divmod(np.arange(len(live) * len(sprites)), len(sprites))
+		self.tests = len(b)
+		# the bullet's motion relative to each sprite
+		toi = sweep_circle(px[b] - sx[j], py[b] - sy[j], bex[b] - sex[j], bey[b] - sey[j], bounds[j])
+		if before is not None:
+			toi[toi >= before[live[b]]] = np.inf
+		hit = np.flatnonzero(np.isfinite(toi))
+		hit = hit[np.argsort(toi[hit], kind="stable")]
+		return [(self.handles[i], sprites[k]) for i, k in zip(live[b[hit]].tolist(), j[hit].tolist())]
+
+	def remove(self, bullet):
+		if self.active[bullet.index]:
+			self.active[bullet.index] = False
+			bullet.visible = False
+			self.free.append(bullet.index)
+
+	def clear(self):
+		for bullet in self.live():
+			self.remove(bullet)
+
+	def live(self):
+		return [self.handles[i] for i in np.flatnonzero(self.active).tolist()]
+
+	def __iter__(self):
+		return iter(self.live())
+
+	def __len__(self):
+		return int(np.count_nonzero(self.active))
 
 class Wall(Sprite):
+	color_dict = {0: "white", 1: "gray", 2: "pink", 3: "cyan", 4: "yellow", 5: "blue", 6: "red"}
+
 	def __init__(self, x1, y1, x2, y2, bounce_mode=0):
 		Sprite.__init__(self, "classic", "black", x1, y1, 0)
 		self.ht()
@@ -429,41 +737,38 @@ class Wall(Sprite):
 		self.size = 0
 		self.bounce_mode = bounce_mode
 
-
-	def draw(self):
-		color_dict = {0: "white", 1: "gray", 2: "pink", 3: "cyan", 4: "yellow", 5: "blue", 6: "red"}
-		color = color_dict[self.bounce_mode % len(color_dict)]
-		self.pen = turtle.Turtle()
-		self.pen.color(color)
-		self.pen.penup()
-		self.pen.setposition(self.x1, self.y1)
-		self.pen.pendown()
-		self.pen.pensize(3)
-		self.pen.lt(self.angle)
-		self.pen.fd(max(self.distance(self.x2, self.y2), 1))
-		self.pen.penup()
-		self.pen.ht()
+		# walls never move, so everything the collision tests need is worked out once here
+		self.dx = x2 - x1
+		self.dy = y2 - y1
+		self.length = math.sqrt(self.dx ** 2 + self.dy ** 2)
+		self.k = x2 * y1 - y2 * x1
+		# unit normal, pointing to the left of x1,y1 -> x2,y2
+		self.nx = -self.dy / self.length
+		self.ny = self.dx / self.length
+		self.x_max = max(x1, x2)
+		self.x_min = min(x1, x2)
+		self.y_max = max(y1, y2)
+		self.y_min = min(y1, y2)
+
+	def get_color(self):
+		return Wall.color_dict[self.bounce_mode % len(Wall.color_dict)]
 
 	def dist_point_line(self, px, py):
-		dx = self.x2 - self.x1
-		dy = self.y2 - self.y1
-		return abs(dy * px - dx * py + self.x2 * self.y1 - self.y2 * self.x1) / math.sqrt(dx ** 2 + dy ** 2)
-
-	def is_collided(self, actor):
-		s = actor.size + abs(actor.speed)/2
+		return abs(self.dy * px - self.dx * py + self.k) / self.length
 
+	def pad_scale(self):
 		# avoid phenomenon where player sticks to the wall and oscillates
 		if self.bounce_mode == 1:
-			s *= 1.3
-		x_max = max(self.x1, self.x2)
-		x_min = min(self.x1, self.x2)
-		y_max = max(self.y1, self.y2)
-		y_min = min(self.y1, self.y2)
+			return 1.3
+		return 1
+
+	def is_collided(self, actor):
+		s = (actor.size + abs(actor.speed)/2) * self.pad_scale()
 		px = actor.xcor()
 		py = actor.ycor()
 
 		# actor is in bounding box of wall
-		if (x_min - s < px < x_max + s) and (y_min - s < py < y_max + s):
+		if (self.x_min - s < px < self.x_max + s) and (self.y_min - s < py < self.y_max + s):
 			# actor is actually touching wall
 			if self.dist_point_line(px, py) < s:
 				return True
@@ -472,7 +777,7 @@ class Wall(Sprite):
 	def bounce_standard(self, actor):
 		actor.setheading(-actor.heading() + 2 * self.angle)
 
-	def bounce(self, actor):
+	def bounce(self, actor, game):
 		'''
 		bounce modes:
 		0: standard: 2 * wall - approach. Block all sprites.
@@ -491,7 +796,7 @@ class Wall(Sprite):
 		elif self.bounce_mode == 2:
 			self.bounce_standard(actor)
 			bounds = min(60, abs(int(actor.heading() - self.angle)))
-			actor.setheading(actor.heading() + random.randint(-bounds, bounds))
+			actor.setheading(actor.heading() + game.rng.randint(-bounds, bounds))
 
 		elif self.bounce_mode == 3:
 			if isinstance(actor, Bullet):
@@ -507,22 +812,20 @@ class Wall(Sprite):
 			# b = 1
 			px = actor.xcor()
 			py = actor.ycor()
-			ax = self.x2 - self.x1
-			ay = self.y2 - self.y1
 			dist_to_center = self.dist_point_line(0, 0)
-			dist_to_warp = abs(ay * px - ax * py) / math.sqrt(ax ** 2 + ay ** 2)
+			dist_to_warp = abs(self.dy * px - self.dx * py) / self.length
 
 			if dist_to_warp > dist_to_center:
-				dist_to_warp += player.size
+				dist_to_warp += game.player.size
 			else:
-				dist_to_warp -= player.size
+				dist_to_warp -= game.player.size
 
 			# the reflection will produce 2 pts: 1 in bounds and 1 out of bounds.
 			# go to the point that is in bounds.
-			ax1 = px + math.cos(math.pi / 180 * (self.angle + 90)) * dist_to_warp * 2
-			ay1 = py + math.sin(math.pi / 180 * (self.angle + 90)) * dist_to_warp * 2
-			ax2 = px + math.cos(math.pi / 180 * (self.angle - 90)) * dist_to_warp * 2
-			ay2 = py + math.sin(math.pi / 180 * (self.angle - 90)) * dist_to_warp * 2
+			ax1 = px + self.nx * dist_to_warp * 2
+			ay1 = py + self.ny * dist_to_warp * 2
+			ax2 = px - self.nx * dist_to_warp * 2
+			ay2 = py - self.ny * dist_to_warp * 2
 			if ax1**2 + ay1**2 < ax2**2 + ay2**2:
 				ax = ax1
 				ay = ay1
@@ -534,71 +837,681 @@ class Wall(Sprite):
 		elif self.bounce_mode == 6:
 			self.bounce_standard(actor)
 			if isinstance(actor, Player):
-				player.increment_lives(-1)
+				actor.increment_lives(-1)
 			elif isinstance(actor, Enemy):
 				actor.respawn()
 		else:
 			self.bounce_standard(actor)
 
+def sweep_circle(x, y, ex, ey, r):
+	'''
+	Earliest fraction t (0..1) of the move ex, ey at which a point starting at x, y, relative to a circle's center,
+	comes within r of the center, or inf if it never does. A point that starts inside touches at t = 0. Broadcasts
+	over arrays.
+	'''
+	a = ex * ex + ey * ey
+	b = x * ex + y * ey
+	c = x * x + y * y - r * r
+	disc = b * b - a * c
+	with np.errstate(divide="ignore", invalid="ignore"):
+		t = (-b - np.sqrt(disc)) / a
+	t = np.where((disc >= 0) & (a > 0) & (t >= 0) & (t <= 1), t, np.inf)
+	return np.where(c <= 0, 0.0, t)
+
+class WallGeometry():
+	'''
+	The per-wall constants of a wall layout packed into arrays, so every sprite can be tested against every wall in
+	one vectorized pass. Rebuilt whenever the walls or their bounce modes change.
+	'''
+	def __init__(self, walls):
+		self.walls = list(walls)
+		self.dx = np.array([wall.dx for wall in walls], dtype=float)
+		self.dy = np.array([wall.dy for wall in walls], dtype=float)
+		self.k = np.array([wall.k for wall in walls], dtype=float)
+		self.length = np.array([wall.length for wall in walls], dtype=float)
+		self.x1 = np.array([wall.x1 for wall in walls], dtype=float)
+		self.y1 = np.array([wall.y1 for wall in walls], dtype=float)
+		self.nx = np.array([wall.nx for wall in walls], dtype=float)
+		self.ny = np.array([wall.ny for wall in walls], dtype=float)
+		self.x_min = np.array([wall.x_min for wall in walls], dtype=float)
+		self.x_max = np.array([wall.x_max for wall in walls], dtype=float)
+		self.y_min = np.array([wall.y_min for wall in walls], dtype=float)
+		self.y_max = np.array([wall.y_max for wall in walls], dtype=float)
+		self.pad_scale = np.array([wall.pad_scale() for wall in walls], dtype=float)
+		self.bounce_modes = [wall.bounce_mode for wall in walls]
+		self.bullets_pass = np.array([mode == 4 for mode in self.bounce_modes], dtype=bool)
+
+	def is_current(self, walls):
+		return self.walls == walls and self.bounce_modes == [wall.bounce_mode for wall in walls]
+
+	def hits(self, x, y, pad):
+		'''
+		Same test as Wall.is_collided for sprites at x, y with collision padding pad (size + half speed). Returns
+		(sprite index, wall index) arrays, ordered by sprite and then by wall.
+		'''
+		if len(x) == 0 or len(self.walls) == 0:
+			return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+		x = x[:, None]
+		y = y[:, None]
+		s = pad[:, None] * self.pad_scale
+		in_box = (self.x_min - s < x) & (x < self.x_max + s) & (self.y_min - s < y) & (y < self.y_max + s)
+		touching = np.abs(self.dy * x - self.dx * y + self.k) / self.length < s
+		return np.nonzero(in_box & touching)
+
+	def sweep(self, x, y, ex, ey, r):
+		'''
+		Continuous version of hits for circles of radius r moving by ex, ey from x, y over one tick. Returns a
+		(sprite, wall) array of the fraction of the move at which each circle first touches each wall, inf where it
+		doesn't. Only motion toward a wall counts, so a circle resting against a wall it just bounced off can leave.
+		'''
+		if len(x) == 0 or len(self.walls) == 0:
+			return np.full((len(x), len(self.walls)), np.inf)
+		x = x[:, None] - self.x1
+		y = y[:, None] - self.y1
+		ex = ex[:, None]
+		ey = ey[:, None]
+		# the flat side: the distance to the line closes to r with the contact point between the ends
+		s = x * self.nx + y * self.ny
+		ds = ex * self.nx + ey * self.ny
+		closing = s * ds < 0
+		with np.errstate(divide="ignore", invalid="ignore"):
+			t = np.maximum(np.abs(s) - r, 0) / np.abs(ds)
+			along = ((x + t * ex) * self.dx + (y + t * ey) * self.dy) / self.length
+		side = np.where(closing & (t <= 1) & (along >= 0) & (along <= self.length), t, np.inf)
+		# the rounded ends
+		x2 = x - self.dx
+		y2 = y - self.dy
+		end1 = np.where(x * ex + y * ey < 0, sweep_circle(x, y, ex, ey, r), np.inf)
+		end2 = np.where(x2 * ex + y2 * ey < 0, sweep_circle(x2, y2, ex, ey, r), np.inf)
+		return np.minimum(side, np.minimum(end1, end2))
+
+class SpatialHash():
+	'''
+	Uniform grid broad phase. Each sprite is bucketed into every cell its bounding box covers, so a query only
+	returns sprites from the cells around a point instead of everything on the field. Candidates come back in
+	insertion order so results match a brute-force scan.
+	'''
+	def __init__(self, cell_size=50):
+		self.cell_size = cell_size
+		self.cells = {}
+		self.keys = {}
+		self.order = {}
+
+	def clear(self):
+		self.cells.clear()
+		self.keys.clear()
+		self.order.clear()
+
+	def cell_range(self, x_min, y_min, x_max, y_max):
+		c = self.cell_size
+		return [(i, j) for i in range(int(x_min // c), int(x_max // c) + 1)
+				for j in range(int(y_min // c), int(y_max // c) + 1)]
+
+	def insert(self, sprite, x_min, y_min, x_max, y_max):
+		if sprite not in self.order:
+			self.order[sprite] = len(self.order)
+		keys = self.cell_range(x_min, y_min, x_max, y_max)
+		for key in keys:
+			self.cells.setdefault(key, []).append(sprite)
+		self.keys[sprite] = keys
+
+	def query(self, x, y, r):
+		found = set()
+		for key in self.cell_range(x - r, y - r, x + r, y + r):
+			found.update(self.cells.get(key, ()))
+		return sorted(found, key=self.order.__getitem__)
+
+def expand_ranges(starts, counts):
+	'''
+	The concatenation of range(start, start + count) for each start and count, and which range each element came
+	from.
+	'''
+	owner = np.repeat(np.arange(len(counts)), counts)
+	return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - starts, counts), owner
+
+def box_cells(x_min, y_min, x_max, y_max, cell_size):
+	'''
+	One (cell, box) entry for every grid cell each box covers, with the cell as a single int64 key.
+	'''
+	i0 = np.floor(x_min / cell_size).astype(np.int64)
+	j0 = np.floor(y_min / cell_size).astype(np.int64)
+	nj = np.floor(y_max / cell_size).astype(np.int64) - j0 + 1
+	counts = (np.floor(x_max / cell_size).astype(np.int64) - i0 + 1) * nj
+	k, box = expand_ranges(np.zeros_like(counts), counts)
+	return (i0[box] + k // nj[box]) * 2**32 + j0[box] + k % nj[box], box
+
+def grid_pairs(a, b, cell_size):
+	'''
+	Broad phase for two sets of boxes, each given as (x_min, y_min, x_max, y_max) arrays: the (i, j) pairs of box
+	i of a and box j of b that cover a common grid cell, once each and sorted. The b boxes are bucketed by sorting
+	their cells, then each cell of an a box looks its bucket up with a binary search, so the work follows how
+	crowded the cells are rather than len(a) * len(b).
+	'''
+	a_cells, a_box = box_cells(*a, cell_size)
+	b_cells, b_box = box_cells(*b, cell_size)
+	order = np.argsort(b_cells, kind="stable")
+	b_cells = b_cells[order]
+	b_box = b_box[order]
+	lo = np.searchsorted(b_cells, a_cells, "left")
+	counts = np.searchsorted(b_cells, a_cells, "right") - lo
+	k, entry = expand_ranges(lo, counts)
+	# a pair sharing several cells turns up once per cell
+	pairs = np.unique(a_box[entry] * len(b[0]) + b_box[k])
+	return np.divmod(pairs, len(b[0]))
+
+class ArenaGrid():
+	'''
+	A grid of cell_size squares over the arena, for fields that are looked up by position. Positions off the grid
+	are clamped to its edge cells.
+	'''
+	def __init__(self, game, cell_size):
+		self.game = game
+		self.cell_size = cell_size
+		self.x0 = -game.border_size_x
+		self.y0 = -game.border_size_y
+		self.nx = int(2 * game.border_size_x // cell_size) + 1
+		self.ny = int(2 * game.border_size_y // cell_size) + 1
+
+	def cell(self, x, y):
+		i = min(max(int((x - self.x0) // self.cell_size), 0), self.nx - 1)
+		j = min(max(int((y - self.y0) // self.cell_size), 0), self.ny - 1)
+		return i, j
+
+	def center(self, i, j):
+		return self.x0 + (i + 0.5) * self.cell_size, self.y0 + (j + 0.5) * self.cell_size
+
+	def wall_distances(self, geometry):
+		'''
+		Distance from each cell's center to the nearest point of each wall, as an (nx, ny, walls) array.
+		'''
+		px = (self.x0 + (np.arange(self.nx) + 0.5) * self.cell_size)[:, None, None]
+		py = (self.y0 + (np.arange(self.ny) + 0.5) * self.cell_size)[None, :, None]
+		t = np.clip(((px - geometry.x1) * geometry.dx + (py - geometry.y1) * geometry.dy) / geometry.length**2, 0, 1)
+		return np.hypot(px - geometry.x1 - t * geometry.dx, py - geometry.y1 - t * geometry.dy)
+
+class ThreatField(ArenaGrid):
+	'''
+	Coarse grid of how dangerous each part of the arena is, for the player autopilot. Walls don't move, so their
+	share is worked out once per wall layout. Each enemy stamps a small kernel onto a layer of its own, and only the
+	enemies that changed cell (or stopped or started scattering) since the last tick are stamped again. refresh()
+	brings the field up to date at most once per tick, however many players read it, and reading it is O(1).
+
+	Hot walls count the most and walls actors pass through not at all; scattered enemies are harmless to run into.
+	'''
+	wall_weights = {3: 0, 6: 6}
+	wall_reach = 90
+	enemy_radius = 4 # cells
+
+	def __init__(self, game, cell_size=25):
+		ArenaGrid.__init__(self, game, cell_size)
+		self.walls = np.zeros((self.nx, self.ny))
+		self.enemies = np.zeros((self.nx, self.ny))
+		self.geometry = None
+		self.stamps = {}
+		self.tick = None
+		r = ThreatField.enemy_radius
+		di, dj = np.mgrid[-r:r + 1, -r:r + 1]
+		self.kernel = np.maximum(1 - np.hypot(di, dj) / (r + 1), 0) ** 2
+
+	def build_walls(self, geometry):
+		'''
+		Each wall adds weight * (1 - d / wall_reach)**2 within wall_reach of it, d being the distance from a cell's
+		center to the nearest point of the wall.
+		'''
+		self.geometry = geometry
+		self.walls[:] = 0
+		if not geometry.walls:
+			return
+		d = self.wall_distances(geometry)
+		weights = np.array([ThreatField.wall_weights.get(mode, 1) for mode in geometry.bounce_modes], dtype=float)
+		self.walls[:] = (weights * np.maximum(1 - d / ThreatField.wall_reach, 0) ** 2).sum(axis=2)
+
+	def stamp(self, key, sign):
+		i, j, scattered = key
+		if scattered:
+			return
+		r = ThreatField.enemy_radius
+		i0, i1 = max(i - r, 0), min(i + r + 1, self.nx)
+		j0, j1 = max(j - r, 0), min(j + r + 1, self.ny)
+		self.enemies[i0:i1, j0:j1] += sign * self.kernel[i0 - i + r:i1 - i + r, j0 - j + r:j1 - j + r]
+
+	def refresh(self):
+		game = self.game
+		game.prepare_walls()
+		if self.geometry is not game.wall_geometry:
+			self.build_walls(game.wall_geometry)
+		if self.tick == game.clock.ticks:
+			return
+		self.tick = game.clock.ticks
+		seen = set()
+		for actor in game.actors:
+			if isinstance(actor, Enemy):
+				seen.add(actor)
+				key = self.cell(actor.x, actor.y) + (actor.scattered,)
+				old = self.stamps.get(actor)
+				if key != old:
+					if old:
+						self.stamp(old, -1)
+					self.stamp(key, 1)
+					self.stamps[actor] = key
+		for actor in [actor for actor in self.stamps if actor not in seen]:
+			self.stamp(self.stamps.pop(actor), -1)
+
+	def enemy_threat(self, x, y):
+		return self.enemies[self.cell(x, y)]
+
+	def potential(self, x, y):
+		ij = self.cell(x, y)
+		return self.walls[ij] + self.enemies[ij]
+
+	def gradient(self, x, y):
+		'''
+		Central difference of the field around x, y, per cell, as (d/dx, d/dy).
+		'''
+		i, j = self.cell(x, y)
+		i0, i1 = max(i - 1, 0), min(i + 1, self.nx - 1)
+		j0, j1 = max(j - 1, 0), min(j + 1, self.ny - 1)
+		gx = (self.walls[i1, j] + self.enemies[i1, j] - self.walls[i0, j] - self.enemies[i0, j]) / max(i1 - i0, 1)
+		gy = (self.walls[i, j1] + self.enemies[i, j1] - self.walls[i, j0] - self.enemies[i, j0]) / max(j1 - j0, 1)
+		return gx, gy
+
+class FlowField(ArenaGrid):
+	'''
+	Shortest routes around the walls, for enemy guidance. Cells that a wall stopping actors runs through are blocked,
+	and the cells within clearance of one cost near_wall_cost times as much to cross, so routes keep off walls but
+	an enemy already close to one still has a way out. A Dijkstra search out from a target's cell (straight steps cost
+	1, diagonal ones sqrt(2), and no cutting past a blocked corner) gives every cell its route length to the target and
+	the next cell along that route. A target's routes are only searched again when it moves to another cell or the
+	walls change; every enemy chasing it then looks its way up in O(1).
+	'''
+	clearance = 60
+	near_wall_cost = 3
+	lookahead = 3 # cells
+
+	def __init__(self, game, cell_size=40):
+		ArenaGrid.__init__(self, game, cell_size)
+		self.geometry = None
+		self.neighbors = []
+		self.routes = {}
+
+	def prepare(self):
+		self.game.prepare_walls()
+		geometry = self.game.wall_geometry
+		if geometry is self.geometry:
+			return
+		self.geometry = geometry
+		self.routes.clear()
+		blocked = np.zeros((self.nx, self.ny), dtype=bool)
+		cost = np.ones((self.nx, self.ny))
+		stops = [mode != 3 for mode in geometry.bounce_modes]
+		if any(stops):
+			d = self.wall_distances(geometry)[:, :, stops].min(axis=2)
+			# a wall crossing a cell passes within half its diagonal of the center
+			blocked = d < self.cell_size / math.sqrt(2)
+			cost[d < self.cell_size / math.sqrt(2) + FlowField.clearance] = FlowField.near_wall_cost
+		blocked = blocked.tolist()
+		cost = cost.tolist()
+
+		def steps(i, j):
+			for di in (-1, 0, 1):
+				for dj in (-1, 0, 1):
+					a, b = i + di, j + dj
+					if (di or dj) and 0 <= a < self.nx and 0 <= b < self.ny and not blocked[a][b] and \
+							not (di and dj and (blocked[a][j] or blocked[i][b])):
+						yield a * self.ny + b, math.hypot(di, dj) * cost[a][b]
+
+		# cells are numbered i * ny + j; a blocked cell can be left but not entered
+		self.neighbors = [list(steps(i, j)) for i in range(self.nx) for j in range(self.ny)]
+
+	def search(self, start):
+		dist = [math.inf] * len(self.neighbors)
+		toward = list(range(len(self.neighbors)))
+		dist[start] = 0
+		heap = [(0, start)]
+		while heap:
+			d, u = heapq.heappop(heap)
+			if d > dist[u]:
+				continue
+			for v, cost in self.neighbors[u]:
+				if d + cost < dist[v]:
+					dist[v] = d + cost
+					toward[v] = u
+					heapq.heappush(heap, (d + cost, v))
+		return dist, toward
+
+	def route(self, target):
+		self.prepare()
+		i, j = self.cell(target.x, target.y)
+		start = i * self.ny + j
+		route = self.routes.get(target)
+		if route is None or route[0] != start:
+			route = self.routes[target] = (start,) + self.search(start)
+		return route
+
+	def steer(self, target, x, y, ax, ay):
+		'''
+		Aim point for an enemy at x, y going after target by way of ax, ay. That is kept while the route to target is
+		as short as the straight line, i.e. no wall is in the way; otherwise the enemy aims lookahead cells ahead along
+		the route. Enemies with no route (boxed in, or in a cell a wall runs through) keep ax, ay.
+		'''
+		start, dist, toward = self.route(target)
+		i, j = self.cell(x, y)
+		k = i * self.ny + j
+		di = abs(i - start // self.ny)
+		dj = abs(j - start % self.ny)
+		straight = max(di, dj) + (math.sqrt(2) - 1) * min(di, dj)
+		if dist[k] == math.inf or dist[k] <= straight + 1e-6:
+			return ax, ay
+		for _ in range(FlowField.lookahead):
+			k = toward[k]
+		return self.center(k // self.ny, k % self.ny)
+
+class SimClock():
+	'''
+	Simulation time. It moves on a fixed step per SpaceWar.update rather than with the wall clock, so fire rates,
+	invulnerability, scattering and bullet lifetimes play out the same on every run and at any playback speed.
+	'''
+	def __init__(self, tick_time=1/30):
+		self.tick_time = tick_time
+		self.ticks = 0
+
+	def time(self):
+		return self.ticks * self.tick_time
+
+	def advance(self):
+		self.ticks += 1
+
+class Timers():
+	'''
+	Expiry callbacks kept in a heap by due time, so each tick only touches the timers that are due instead of polling
+	every sprite with a status. Timers are keyed, e.g. (sprite, "invuln"): scheduling a key again moves its timer and
+	the old heap entry is skipped when it surfaces. Timers due at the same time fire in the order they were set.
+	'''
+	def __init__(self):
+		self.heap = []
+		self.pending = {}
+		self.order = itertools.count()
+
+	def schedule(self, key, when, callback):
+		n = next(self.order)
+		self.pending[key] = n
+		heapq.heappush(self.heap, (when, n, key, callback))
+
+	def cancel(self, key):
+		self.pending.pop(key, None)
+
+	def run(self, now):
+		'''
+		Fires every timer whose due time is before now, including any that their callbacks set for before now, and
+		returns how many fired.
+		'''
+		fired = 0
+		while self.heap and self.heap[0][0] < now:
+			when, n, key, callback = heapq.heappop(self.heap)
+			if self.pending.get(key) == n:
+				del self.pending[key]
+				callback()
+				fired += 1
+		return fired
+
+	def __len__(self):
+		return len(self.pending)
+
+class InputRecorder():
+	'''
+	Everything needed to replay a game: the seed, the options it started with, and each key press with the tick it
+	landed on. Key presses are applied between ticks, so a key logged at tick n is pressed after n updates.
+	'''
+	def __init__(self, seed, options, num_enemies, inputs=None, ticks=0):
+		self.seed = seed
+		self.options = dict(options)
+		self.num_enemies = num_enemies
+		self.inputs = inputs if inputs else []
+		self.ticks = ticks
+
+	def record(self, tick, key):
+		self.inputs.append((tick, key))
+
+	def save(self, path):
+		with open(path, "w") as f:
+			json.dump({"seed": self.seed, "options": self.options, "num_enemies": self.num_enemies,
+					   "ticks": self.ticks, "inputs": self.inputs}, f)
+
+	@staticmethod
+	def load(path):
+		with open(path) as f:
+			log = json.load(f)
+		return InputRecorder(log["seed"], log["options"], log["num_enemies"],
+							 [tuple(i) for i in log["inputs"]], log["ticks"])
+
 class SpaceWar():
-	def __init__(self, border_size_x, border_size_y, options):
-		self.options = options
+	def __init__(self, border_size_x, border_size_y, options, renderer=None, seed=None, clock=None):
+		self.options = dict(default_options, **options)
+		# every run gets a seed, so any game can be recorded and replayed
+		self.seed = seed if seed is not None else random.randrange(2**32)
+		self.rng = random.Random(self.seed)
+		self.clock = clock if clock else SimClock()
+		self.recorder = None
+		self.player = None
+		self.prize = None
 		self.actors = []
-		self.bullets = []
+		self.bullets = ProjectilePool(self.clock)
+		self.timers = Timers()
 		self.walls = []
+		self.stars = []
 		self.score = self.highScore = 0
+		# the score reset_game last cleared, i.e. the final score of the previous game
+		self.last_score = 0
+		self.resets = 0
 
 		self.active = True
 		self.border_size_x = border_size_x
 		self.border_size_y = border_size_y
 
-		self.text1 = turtle.Turtle()
-		self.text2 = turtle.Turtle()
-		self.bkgnd = turtle.Turtle()
-		self.text1.ht()
-		self.text2.ht()
-		self.bkgnd.ht()
+		# headless unless a renderer is plugged in
+		self.renderer = renderer if renderer else Renderer()
+		self.profiler = FrameProfiler()
+		self.hud = Hud()
+		self.wall_hash = SpatialHash(self.options["spatial_hash_cell_size"])
+		self.wall_geometry = WallGeometry([])
+		self.threat_field = ThreatField(self)
+		self.flow_field = FlowField(self, self.options["flow_field_cell_size"])
 		self.time_delta = 1/30
 		self.frame_time_queue = queue.Queue(5)
 
 	def update(self):
+		prof = self.profiler
+		prof.next_frame()
+		t = time.perf_counter()
+		now = self.clock.time()
+		for actor in self.actors:
+			actor.save_pos()
+		prof.count("timers_fired", self.timers.run(now))
+
 		# actors
+		enemies = [actor for actor in self.actors if isinstance(actor, Enemy)]
+		# NumPy's per-call overhead outweighs the scalar path for a handful of enemies
+		batch = len(enemies) >= self.options["batch_guidance_min_enemies"]
 		for i, actor in enumerate(self.actors):
 			if isinstance(actor, Player):
+				if actor.on_autopilot:
+					actor.autopilot()
 				actor.move()
-				actor.invuln_off()
-				if actor.is_collided(prize):
-					prize.award()
-			if isinstance(actor, Enemy):
+				prof.count("collision_tests", 1)
+				if actor.is_collided(self.prize):
+					self.prize.award()
+			if isinstance(actor, Enemy) and not batch:
+				t = prof.record("actors", t)
 				actor.update_aim_pt()
+				t = prof.record("guidance", t)
 				# if collided with player or bullet or OOB, respawn
 				if self.options["enemies_can_move"]:
 					actor.move()
+					t = prof.record("actors", t)
 					actor.autopilot()
-				if player.is_collided(actor):
-					if actor.scattered:
-						self.increment_score(actor)
-						actor.respawn()
-					else:
-						if not player.is_invuln:
-							player.increment_lives(-1)
-							actor.respawn()
-
-			for wall in game.walls:
-				if wall.is_collided(actor):
-					wall.bounce(actor)
+					t = prof.record("guidance", t)
+				self.collide_player(actor)
+		if batch:
+			# every enemy steers off the same snapshot of the field, then they all move and turn together
+			t = prof.record("actors", t)
+			update_aim_pts(self, enemies)
+			t = prof.record("guidance", t)
+			if self.options["enemies_can_move"]:
+				for actor in enemies:
+					actor.move()
+				t = prof.record("actors", t)
+				autopilot_all(self, enemies)
+				t = prof.record("guidance", t)
+			for actor in enemies:
+				self.collide_player(actor)
+		t = prof.record("actors", t)
+
+		x = np.array([actor.xcor() for actor in self.actors])
+		y = np.array([actor.ycor() for actor in self.actors])
+		pad = np.array([actor.size + abs(actor.speed)/2 for actor in self.actors])
+		self.collide_all_walls(self.actors, x, y, pad)
+		t = prof.record("walls", t)
 
 		# bullets
-		for i, bullet in enumerate(self.bullets):
-			bullet.move()
-			for j, actor in enumerate(self.actors):
-				if isinstance(actor, Enemy) and actor.is_collided(bullet):
-					self.increment_score(actor, bullet)
-					actor.respawn()
-			for j, wall in enumerate(self.walls):
-				if wall.is_collided(bullet):
-					wall.bounce(bullet)
-					bullet.wall_hit(wall)
+		self.bullets.step(now, self.border_size_x, self.border_size_y)
+		prof.count("live_bullets", len(self.bullets))
+		t = prof.record("bullet_move", t)
+		toi, hit_walls = self.sweep_bullet_walls()
+		# below a few thousand pairs, testing them all costs less than bucketing them
+		cell_size = None
+		if self.options["use_spatial_hash"] and (len(self.bullets) * len(enemies) >=
+												 self.options["broad_phase_min_pairs"]):
+			cell_size = self.options["spatial_hash_cell_size"]
+		struck = set()
+		for bullet, actor in self.bullets.hits(enemies, toi, cell_size):
+			# the first bullet to reach an enemy sends it elsewhere
+			if actor not in struck:
+				struck.add(actor)
+				self.increment_score(actor, bullet)
+				actor.respawn()
+		prof.count("collision_tests", self.bullets.tests)
+		t = prof.record("collisions", t)
+		self.bounce_bullets(toi, hit_walls)
+		prof.record("walls", t)
+		self.clock.advance()
+
+	def collide_player(self, enemy):
+		self.profiler.count("collision_tests", 1)
+		if self.player.is_collided(enemy):
+			if enemy.scattered:
+				self.increment_score(enemy)
+				enemy.respawn()
+			else:
+				if not self.player.is_invuln:
+					self.player.increment_lives(-1)
+					enemy.respawn()
+
+	def prepare_walls(self):
+		'''
+		Walls don't move, so the wall grid and the packed wall constants are only rebuilt when the list of walls or
+		their bounce modes change.
+		'''
+		if self.wall_geometry.is_current(self.walls):
+			return
+		self.wall_hash.clear()
+		for wall in self.walls:
+			self.wall_hash.insert(wall, wall.x_min, wall.y_min, wall.x_max, wall.y_max)
+		self.wall_geometry = WallGeometry(self.walls)
+
+	def walls_near(self, sprite, after=None):
+		if not self.options["use_spatial_hash"]:
+			walls = self.walls
+		else:
+			self.prepare_walls()
+			# same padding as Wall.is_collided, with the bounce mode 1 margin
+			r = (sprite.size + abs(sprite.speed)/2) * 1.3
+			walls = self.wall_hash.query(sprite.xcor(), sprite.ycor(), r)
+		if after is not None:
+			walls = [wall for wall in walls if self.walls.index(wall) > self.walls.index(after)]
+		return walls
+
+	def collide_all_walls(self, sprites, x, y, pad):
+		'''
+		Wall collisions for a batch of sprites at x, y with collision padding pad. With "batch_wall_collisions" on,
+		one vectorized pass finds the touching pairs and only those sprites go on to collide_walls.
+		'''
+		if not self.options["batch_wall_collisions"]:
+			for sprite in sprites:
+				self.collide_walls(sprite)
+			return
+		self.prepare_walls()
+		self.profiler.count("collision_tests", len(sprites) * len(self.walls))
+		hit_sprites, hit_walls = self.wall_geometry.hits(x, y, pad)
+		walls_hit = {}
+		for i, j in zip(hit_sprites.tolist(), hit_walls.tolist()):
+			walls_hit.setdefault(i, []).append(self.walls[j])
+		resets = self.resets
+		for i, sprite in enumerate(sprites):
+			if self.resets != resets:
+				# a hot wall ended the game and moved everyone, so the pairs found above are stale
+				self.collide_walls(sprite)
+			elif i in walls_hit:
+				self.collide_walls(sprite, walls_hit[i])
+
+	def sweep_bullet_walls(self):
+		'''
+		Where each bullet's move this tick first meets a wall, as two arrays over the pool's slots: the fraction of
+		the move and the wall's index, inf and -1 for bullets that stay clear. Walls that let bullets through are left
+		out. Ties go to the earlier wall, as in collide_walls.
+		'''
+		pool = self.bullets
+		toi = np.full(pool.capacity, np.inf)
+		hit_walls = np.full(pool.capacity, -1)
+		self.prepare_walls()
+		slots = np.flatnonzero(pool.active)
+		self.profiler.count("collision_tests", len(slots) * len(self.walls))
+		if len(slots) == 0 or len(self.walls) == 0:
+			return toi, hit_walls
+		x = pool.prev_x[slots]
+		y = pool.prev_y[slots]
+		times = self.wall_geometry.sweep(x, y, pool.x[slots] - x, pool.y[slots] - y, Bullet.size)
+		times[:, self.wall_geometry.bullets_pass] = np.inf
+		first = np.argmin(times, axis=1)
+		toi[slots] = times[np.arange(len(slots)), first]
+		hit_walls[slots] = np.where(np.isfinite(toi[slots]), first, -1)
+		return toi, hit_walls
+
+	def bounce_bullets(self, toi, hit_walls):
+		'''
+		Moves each bullet that met a wall back to the point of contact and bounces it there. The rest of that move is
+		dropped, so a bullet meets at most one wall per tick.
+		'''
+		pool = self.bullets
+		slots = np.flatnonzero(pool.active & (hit_walls >= 0))
+		pool.x[slots] = pool.prev_x[slots] + toi[slots] * (pool.x[slots] - pool.prev_x[slots])
+		pool.y[slots] = pool.prev_y[slots] + toi[slots] * (pool.y[slots] - pool.prev_y[slots])
+		for i in slots.tolist():
+			bullet = pool.handles[i]
+			wall = self.walls[hit_walls[i]]
+			wall.bounce(bullet, self)
+			bullet.wall_hit(wall)
+
+	def collide_walls(self, sprite, walls=None):
+		'''
+		Bounces the sprite off each wall it touches, in wall order. A warp wall moves the sprite, so the walls after
+		it are looked up again from the new position.
+		'''
+		if walls is None:
+			walls = self.walls_near(sprite)
+		i = 0
+		while i < len(walls):
+			wall = walls[i]
+			i += 1
+			self.profiler.count("collision_tests", 1)
+			if wall.is_collided(sprite):
+				x = sprite.xcor()
+				y = sprite.ycor()
+				wall.bounce(sprite, self)
+				if isinstance(sprite, Bullet):
+					sprite.wall_hit(wall)
+				if (x, y) != (sprite.xcor(), sprite.ycor()):
+					walls = self.walls_near(sprite, wall)
+					i = 0
 
 	def maf_frame_rate(self, td):
 		'''
@@ -608,6 +1521,7 @@ class SpaceWar():
 			td_oldest = self.frame_time_queue.get()
 		else:
 			td_oldest = self.time_delta
+		self.frame_time_queue.put(td)
 		self.time_delta += (td - td_oldest) / self.frame_time_queue.maxsize
 
 	def make_border(self):
@@ -618,33 +1532,63 @@ class SpaceWar():
 		wall3 = Wall(bx, by, bx, -by, 5)
 		wall4 = Wall(bx, -by, -bx, -by,1)
 		self.walls.extend([wall1, wall2, wall3, wall4])
+		self.prepare_walls()
 
 	def draw_walls(self):
-		for wall in game.walls:
-			if game.options["all_walls_bounce_mode"] >= 0:
-				wall.bounce_mode = game.options["all_walls_bounce_mode"]
-			wall.draw()
+		for wall in self.walls:
+			if self.options["all_walls_bounce_mode"] >= 0:
+				wall.bounce_mode = self.options["all_walls_bounce_mode"]
+		self.prepare_walls()
+		self.renderer.draw_walls(self)
 
 	def draw_background(self):
-		self.bkgnd.speed(0)
-		self.bkgnd.color("white")
 		bx = self.border_size_x
 		by = self.border_size_y
+		self.stars = []
 		for _ in range(int(bx/4)):
-			self.bkgnd.penup()
-			self.bkgnd.goto(random.randint(-bx, bx), random.randint(-by, by))
-			self.bkgnd.dot(random.randint(1,3))
+			self.stars.append((self.rng.randint(-bx, bx), self.rng.randint(-by, by), self.rng.randint(1,3)))
+		self.renderer.draw_background(self)
 
 	def make_enemies(self, num_enemies):
 		for i in range(num_enemies):
-			e = Enemy()
+			e = Enemy(self)
 			if len(self.options["allowed_enemy_guidance_modes"]) > 0:
-				e.set_guidance(random.choice(self.options["allowed_enemy_guidance_modes"]))
+				e.set_guidance(self.rng.choice(self.options["allowed_enemy_guidance_modes"]))
 			else:
 				e.set_guidance(i % 6)
 			e.speed = min(2 + i / 2, 5)
 			self.actors.append(e)
 
+	def get_key_actions(self):
+		'''
+		Keys that change the simulation. They go through press() so they can be recorded.
+		'''
+		return {
+			"Left": self.player.turn_left,
+			"Right": self.player.turn_right,
+			"Up": self.player.accel,
+			"Down": self.player.decel,
+			"r": self.player.respawn,
+			"z": self.player.fire_bullet,
+			"x": self.player.fire_bounce,
+			"space": self.player.bomb,
+			"a": self.player.toggle_autopilot,
+			"p": self.toggle_enemy_movement
+		}
+
+	def press(self, key):
+		if self.recorder:
+			self.recorder.record(self.clock.ticks, key)
+		self.get_key_actions()[key]()
+
+	def start_recording(self, num_enemies):
+		self.recorder = InputRecorder(self.seed, self.options, num_enemies)
+
+	def stop_recording(self, path):
+		self.recorder.ticks = self.clock.ticks
+		self.recorder.save(path)
+		self.recorder = None
+
 	def toggle_enemy_movement(self):
 		self.options["enemies_can_move"] ^= 1
 
@@ -660,63 +1604,378 @@ class SpaceWar():
 		self.score += score
 		self.highScore = max(self.score, self.highScore)
 		if score > 0 and self.score//1000 - temp//1000 > 0:
-			player.bombs += 1
-		game.show_score()
+			self.player.bombs += 1
+		self.show_score()
 
 	def reset_game(self):
-		player.lives = player.start_lives
+		self.resets += 1
+		self.player.lives = self.player.start_lives
+		self.last_score = self.score
 		self.score = 0
-		player.bombs = player.start_bombs
-		for actor in game.actors:
+		self.player.bombs = self.player.start_bombs
+		for actor in self.actors:
 			actor.respawn()
-		for bullet in game.bullets:
-			bullet.__del__()
-		game.show_score()
+		self.bullets.clear()
+		self.show_score()
 
 	def show_score(self):
-		self.text1.speed(0)
-		self.text1.color("white")
-		self.text1.penup()
-		s = "Score: {0:<5}\t Lives: {1:<5}\t Bombs: {2:<5}\t High Score: {3:<5}".format(str(self.score),
-																						str(player.lives),
-																						str(player.bombs),
-																						str(self.highScore))
-		self.text1.goto(-self.border_size_x * 0.5 + 100, self.border_size_y + 10)
-		self.text1.clear()
-		self.text1.write(s, font=("Arial", 16, "normal"))
+		x = -self.border_size_x * 0.5 + 100
+		y = self.border_size_y + 10
+		self.hud.set("score", "Score: {}".format(self.score), x, y, 16)
+		self.hud.set("lives", "Lives: {}".format(self.player.lives), x + 200, y, 16)
+		self.hud.set("bombs", "Bombs: {}".format(self.player.bombs), x + 400, y, 16)
+		self.hud.set("high_score", "High Score: {}".format(self.highScore), x + 600, y, 16)
 
 	def show_controls(self):
-		self.text2.speed(0)
-		self.text2.color("white")
-		self.text2.penup()
 		s1 = "Respawn: {0:<5}\t Cannon: {1:<5}\t Bouncy Ball: {2:<5}\t Bomb: {3:<5}\t".format("R", "Z", "X", "Space")
-		s2 = "Toggle Enemy Move: {0:<5}\t Quit: {1:<5}".format("P", "Q")
+		s2 = "Autopilot: {0:<5}\t Toggle Enemy Move: {1:<5}\t Quit: {2:<5}".format("A", "P", "Q")
 		s = s1 + s2
-		self.text2.goto(-self.border_size_x * 0.5 + 50, -self.border_size_y - 25)
-		self.text2.clear()
-		self.text2.write(s, font=("Arial", 14, "normal"))
+		self.hud.set("controls", s, -self.border_size_x * 0.5 + 50, -self.border_size_y - 25, 14)
+
+	def draw(self, alpha=1):
+		t = time.perf_counter()
+		self.profiler.count("hud_writes", self.hud.flush(self.renderer))
+		self.renderer.draw(self, alpha)
+		self.profiler.record("render", t)
+
+	def dump_profile(self):
+		stamp = time.strftime("%Y%m%d-%H%M%S")
+		self.profiler.dump_csv("space_war_profile_{}.csv".format(stamp))
+		self.profiler.dump_json("space_war_profile_{}.json".format(stamp))
 
 	def exit_game(self):
-		turtle.bye()
+		self.renderer.close()
 		self.active = False
 
-# Turtle setup
-turtle.fd(0)
-turtle.speed(30)
-turtle.ht()
-turtle.delay(0)
-turtle.setundobuffer(1)
-turtle.tracer(0)
-
-# Screen
-wn = turtle.Screen()
-wn.setup(width = 1.0, height = 1.0)
-wn.title("Space War")
-wn.bgcolor("black")
-wn.colormode(255)
+class FrameProfiler():
+	'''
+	Per-frame timings of each phase of SpaceWar.update (plus drawing) and per-frame counters, kept in a ring buffer
+	of the last history frames. A frame starts at each update; whatever is drawn after it is counted in that frame.
+
+	Phases are timed back to back: record(phase, t) adds the time since t to the phase and returns the current time
+	to start the next one from.
+	'''
+	phases = ("actors", "guidance", "bullet_move", "collisions", "walls", "render")
+	counters = ("live_bullets", "collision_tests", "hud_writes", "timers_fired")
+
+	def __init__(self, history=1800):
+		self.enabled = True
+		self.frames = collections.deque(maxlen=history)
+		self.current = None
+
+	def next_frame(self):
+		if self.current is not None:
+			self.frames.append(self.current)
+		self.current = dict.fromkeys(FrameProfiler.phases + FrameProfiler.counters, 0)
+
+	def record(self, phase, t):
+		now = time.perf_counter()
+		if self.enabled and self.current is not None:
+			self.current[phase] += now - t
+		return now
+
+	def count(self, counter, n):
+		if self.enabled and self.current is not None:
+			self.current[counter] += n
+
+	def rows(self):
+		rows = list(self.frames)
+		if self.current is not None:
+			rows.append(self.current)
+		return [dict(row, total=sum(row[phase] for phase in FrameProfiler.phases)) for row in rows]
+
+	def percentiles(self):
+		'''
+		p50/p95/p99 of every phase (in ms) and counter over the frames in the buffer.
+		'''
+		rows = self.rows()
+		stats = {}
+		if not rows:
+			return stats
+		for name in FrameProfiler.phases + ("total",) + FrameProfiler.counters:
+			scale = 1000 if name not in FrameProfiler.counters else 1
+			values = np.array([row[name] for row in rows]) * scale
+			stats[name] = dict(zip(("p50", "p95", "p99"), np.percentile(values, [50, 95, 99]).tolist()))
+		return stats
+
+	def summary(self):
+		lines = ["{:<16}{:>12}{:>12}{:>12}".format("", "p50", "p95", "p99")]
+		for name, p in self.percentiles().items():
+			# times in ms to the microsecond, counters as whole numbers
+			spec = "{:>12.0f}" if name in FrameProfiler.counters else "{:>12.3f}"
+			lines.append(("{:<16}" + spec * 3).format(name, p["p50"], p["p95"], p["p99"]))
+		return "\n".join(lines)
+
+	def dump_csv(self, path):
+		with open(path, "w", newline="") as f:
+			writer = csv.DictWriter(f, FrameProfiler.phases + ("total",) + FrameProfiler.counters)
+			writer.writeheader()
+			writer.writerows(self.rows())
+
+	def dump_json(self, path):
+		with open(path, "w") as f:
+			json.dump({"percentiles": self.percentiles(), "frames": self.rows()}, f)
+
+class GameLoop():
+	'''
+	Fixed-timestep scheduler. The simulation ticks at its clock's rate no matter how fast the machine is, drawing is
+	capped at max_fps and interpolated between ticks, and the time in between is slept away instead of spun. After a
+	slow frame at most max_catchup ticks are run back to back; anything beyond that is dropped, so the game slows down
+	instead of spiralling.
+	'''
+	def __init__(self, game, max_fps=60, max_catchup=5):
+		self.game = game
+		self.tick_time = game.clock.tick_time
+		self.frame_time = 1 / max_fps
+		self.max_catchup = max_catchup
+		self.ticks = 0
+		self.frames = 0
+		self.dropped_time = 0
+
+	def run(self):
+		game = self.game
+		last = time.perf_counter()
+		lag = 0
+		next_frame = last
+		last_frame = last
+		while game.active:
+			now = time.perf_counter()
+			lag += now - last
+			last = now
+
+			steps = 0
+			while lag >= self.tick_time and steps < self.max_catchup and game.active:
+				game.update()
+				lag -= self.tick_time
+				steps += 1
+				self.ticks += 1
+			if lag >= self.tick_time:
+				self.dropped_time += lag - lag % self.tick_time
+				lag %= self.tick_time
+
+			if now >= next_frame and game.active:
+				game.draw(lag / self.tick_time)
+				game.maf_frame_rate(now - last_frame)
+				last_frame = now
+				self.frames += 1
+				next_frame = max(next_frame + self.frame_time, now)
+
+			# yield to the OS until the next tick or frame is due
+			next_tick = now + self.tick_time - lag
+			time.sleep(max(0, min(next_tick, next_frame) - time.perf_counter()))
+
+class Hud():
+	'''
+	The text on screen, split into fields that are drawn separately. Setting a field only stores it; flush() is
+	called once per frame and writes just the fields whose text or position changed since they were last drawn,
+	so a burst of score changes inside one frame costs one redraw of the score.
+	'''
+	def __init__(self):
+		self.fields = {}
+		self.drawn = {}
+
+	def set(self, name, text, x, y, font_size):
+		self.fields[name] = (text, x, y, font_size)
+
+	def flush(self, renderer):
+		writes = 0
+		for name, field in self.fields.items():
+			if self.drawn.get(name) != field:
+				renderer.write_text(name, *field)
+				self.drawn[name] = field
+				writes += 1
+		return writes
+
+# sprite colors and shapes by number, for the compact formats (space_war_server, space_war_snapshot)
+palette = ["black", "white", "cyan", "yellow", "magenta"] + list(Enemy.color_dict.values())
+shapes = ["classic", "arrow", "square", "triangle", "circle"]
+color_index = {color: i for i, color in enumerate(palette)}
+shape_index = {shape: i for i, shape in enumerate(shapes)}
+
+def rasterize_static_layer(game, rgb, margin=2):
+	'''
+	Paints the stars and walls, which never move, into an RGB array once, so a backend can show them as a single
+	image instead of a canvas item per dot and line. rgb maps a color name to an (r, g, b) tuple. The array covers
+	the arena plus margin pixels on each side, rows run top to bottom, and its center pixel is the world origin.
+	'''
+	cx = game.border_size_x + margin
+	cy = game.border_size_y + margin
+	layer = np.zeros((2 * cy + 1, 2 * cx + 1, 3), dtype=np.uint8)
+
+	def paint(x, y, width, color):
+		# width x width squares centered on each point, in world coordinates
+		col = np.rint(x).astype(int) + cx
+		row = cy - np.rint(y).astype(int)
+		for dr in range(-(width // 2), width - width // 2):
+			for dc in range(-(width // 2), width - width // 2):
+				r = np.clip(row + dr, 0, layer.shape[0] - 1)
+				c = np.clip(col + dc, 0, layer.shape[1] - 1)
+				layer[r, c] = color
+
+	for x, y, size in game.stars:
+		paint(np.array([x]), np.array([y]), size, rgb("white"))
+	for wall in game.walls:
+		t = np.linspace(0, 1, int(wall.length * 2) + 2)
+		paint(wall.x1 + t * wall.dx, wall.y1 + t * wall.dy, 3, rgb(wall.get_color()))
+	return layer
+
+class Renderer():
+	'''
+	Draws the game state. The base class draws nothing, which is what headless runs use; backends override the
+	methods they support.
+	'''
+	def draw_background(self, game):
+		pass
+
+	def draw_walls(self, game):
+		pass
+
+	def write_text(self, name, text, x, y, font_size):
+		pass
+
+	def draw(self, game, alpha=1):
+		'''
+		alpha is how far the loop is between the last tick and the next one, for backends that interpolate.
+		'''
+		pass
+
+	def close(self):
+		pass
+
+class TurtleRenderer(Renderer):
+	'''
+	Mirrors the simulation onto the turtle canvas. Pens are handed out per sprite and recycled when a sprite goes
+	away, and a pen is only touched when its sprite's position, heading, color or visibility changed since the
+	last frame, which keeps the Tk calls per frame down.
+	'''
+	def __init__(self):
+		# Turtle setup
+		turtle.fd(0)
+		turtle.speed(30)
+		turtle.ht()
+		turtle.delay(0)
+		turtle.setundobuffer(1)
+		turtle.tracer(0)
+
+		# Screen
+		self.wn = turtle.Screen()
+		self.wn.setup(width = 1.0, height = 1.0)
+		self.wn.title("Space War")
+		self.wn.bgcolor("black")
+		self.wn.colormode(255)
+
+		self.pens = {}
+		self.pen_state = {}
+		self.spare_pens = []
+		self.text_pens = {}
+		self.aim_pen = self.make_pen()
+		self.static_image = None
+		self.static_item = None
+		self.static_dirty = False
+
+	def make_pen(self, shape="classic"):
+		pen = turtle.Turtle(shape = shape)
+		pen.speed(0)
+		pen.penup()
+		pen.ht()
+		return pen
+
+	def get_pen(self, sprite):
+		pen = self.pens.get(sprite)
+		if pen is None:
+			if self.spare_pens:
+				pen = self.spare_pens.pop()
+			else:
+				pen = self.make_pen(sprite.shape)
+			pen.shapesize(stretch_wid = sprite.stretch[0], stretch_len = sprite.stretch[1])
+			self.pens[sprite] = pen
+			self.pen_state[pen] = None
+		return pen
+
+	# stars and walls share one pre-rendered image, rebuilt on the next frame after either changes
+	def draw_background(self, game):
+		self.static_dirty = True
+
+	def draw_walls(self, game):
+		self.static_dirty = True
+
+	def draw_static(self, game):
+		canvas = self.wn.getcanvas()
+		rgb = lambda color: tuple(c >> 8 for c in canvas.winfo_rgb(color))
+		layer = rasterize_static_layer(game, rgb)
+		ppm = "P6 {} {} 255\n".format(layer.shape[1], layer.shape[0]).encode() + layer.tobytes()
+		self.static_image = tkinter.PhotoImage(data=ppm, format="PPM")
+		if self.static_item is None:
+			# the turtle canvas has its origin at the center of the screen, like the world
+			self.static_item = canvas.create_image(0, 0, image=self.static_image)
+		else:
+			canvas.itemconfig(self.static_item, image=self.static_image)
+		canvas.tag_lower(self.static_item)
+		self.static_dirty = False
+
+	def write_text(self, name, text, x, y, font_size):
+		pen = self.text_pens.get(name)
+		if pen is None:
+			pen = self.make_pen()
+			pen.color("white")
+			self.text_pens[name] = pen
+		pen.goto(x, y)
+		pen.clear()
+		pen.write(text, font=("Arial", font_size, "normal"))
+
+	def draw(self, game, alpha=1):
+		if self.static_dirty:
+			self.draw_static(game)
+		live = set()
+		for sprite in game.actors + game.bullets.live():
+			live.add(sprite)
+			pen = self.get_pen(sprite)
+			x, y = sprite.lerp_pos(alpha)
+			state = (x, y, sprite.heading(), sprite.current_color, sprite.visible, sprite.shape)
+			if state == self.pen_state[pen]:
+				continue
+			# bullet handles are reused, so the same sprite can come back as a different shape
+			if self.pen_state[pen] is None or self.pen_state[pen][5] != state[5]:
+				pen.shape(state[5])
+			pen.goto(state[0], state[1])
+			pen.setheading(state[2])
+			pen.color(state[3])
+			if state[4]:
+				pen.st()
+			else:
+				pen.ht()
+			self.pen_state[pen] = state
+
+		# hand pens of despawned sprites back to the pool
+		for sprite in [s for s in self.pens if s not in live]:
+			pen = self.pens.pop(sprite)
+			pen.ht()
+			self.spare_pens.append(pen)
+
+		if game.options["show_aim_pts"]:
+			self.aim_pen.clear()
+			for actor in game.actors:
+				if isinstance(actor, Enemy):
+					self.aim_pen.goto(actor.ax, actor.ay)
+					self.aim_pen.dot()
+		turtle.update()
+
+	def close(self):
+		turtle.bye()
 
 # Game Init options and walls
 
+# keys every preset falls back on
+default_options = {
+	"batch_guidance_min_enemies":48,
+	"batch_wall_collisions":True,
+	"use_spatial_hash":True,
+	"spatial_hash_cell_size":50,
+	"broad_phase_min_pairs":2000,
+	"flow_field_guidance":True,
+	"flow_field_cell_size":40
+}
+
 options_trivial = {
 	"player_can_die":False,
 	"all_walls_bounce_mode":5,
@@ -779,60 +2038,102 @@ options_test = {
 
 game_options = [options_trivial, options_easy, options_standard, options_hard, options_diabolical, options_test]
 
-if len(sys.argv) > 1:
-	option = int(sys.argv[1])
-	game = SpaceWar(800, 450, game_options[option])
-else:
-	game = SpaceWar(800, 450, options_standard)
-bx = game.border_size_x
-by = game.border_size_y
-wall1 = Wall(-bx/2, -by/2, -bx/2, by/2, 6)
-wall2 = Wall(bx/2, -by/2, bx/2, by/2, 4)
-wall3 = Wall(-bx/3, by/2, bx/3, by/2, 3)
-wall4 = Wall(-bx/3, -by/2, bx/3, -by/2, 3)
-
-game.make_border()
-game.walls.extend([wall1, wall2, wall3, wall4])
-game.draw_background()
-game.draw_walls()
-game.show_controls()
-
-# Actor Sprites
-player = Player("triangle", "cyan", 0, -100, 90)
-prize = Prize()
-game.actors.append(player)
-game.actors.append(prize)
-game.make_enemies(12)
-
-# Reset
-game.reset_game()
-
-# Keyboard Bindings
-turtle.listen()
-turtle.onkey(player.turn_left, "Left")
-turtle.onkey(player.turn_right, "Right")
-turtle.onkey(player.accel, "Up")
-turtle.onkey(player.decel, "Down")
-turtle.onkey(player.respawn, "r")
-turtle.onkey(player.fire_bullet, "z")
-turtle.onkey(player.fire_bounce, "x")
-turtle.onkey(player.bomb, "space")
-
-turtle.onkey(game.exit_game, "q")
-turtle.onkey(game.toggle_enemy_movement, "p")
-
-mem = []
-process = psutil.Process(os.getpid())
-mem.append(process.memory_info().rss)
-
-while game.active:
-	t1 = time.time()
-	game.update()
-	turtle.update()
-	t2 = time.time()
-
-print("\nStats:")
-print("High Score: {}".format(game.highScore))
-mem.append(process.memory_info().rss)
-print("\nMemory Usage (MB):")
-print("Start: {}\nEnd:   {}".format(round(mem[0]/1e6, 1), round(mem[1]/1e6, 1)))
\ No newline at end of file
+def new_game(options, renderer=None, num_enemies=12, seed=None, clock=None):
+	'''
+	Builds the arena, player, prize and enemies. Everything a game needs hangs off the returned SpaceWar, so any
+	number of games can run side by side in one process.
+	'''
+	game = SpaceWar(800, 450, options, renderer, seed, clock)
+	bx = game.border_size_x
+	by = game.border_size_y
+	wall1 = Wall(-bx/2, -by/2, -bx/2, by/2, 6)
+	wall2 = Wall(bx/2, -by/2, bx/2, by/2, 4)
+	wall3 = Wall(-bx/3, by/2, bx/3, by/2, 3)
+	wall4 = Wall(-bx/3, -by/2, bx/3, -by/2, 3)
+
+	game.make_border()
+	game.walls.extend([wall1, wall2, wall3, wall4])
+	game.draw_background()
+	game.draw_walls()
+	game.show_controls()
+
+	# Actor Sprites
+	game.player = Player(game, "triangle", "cyan", 0, -100, 90)
+	game.prize = Prize(game)
+	game.actors.append(game.player)
+	game.actors.append(game.prize)
+	game.make_enemies(num_enemies)
+
+	# Reset
+	game.reset_game()
+	return game
+
+def replay(log, profile=False, on_tick=None):
+	'''
+	Plays a recorded game back headless, as fast as it will go, and returns the finished game. The seed, options and
+	inputs are the same, so the run is the same tick for tick; with profile on, the frame timings are those of the
+	replayed run. on_tick, if given, is called with the game after every tick.
+	'''
+	game = new_game(log.options, num_enemies=log.num_enemies, seed=log.seed)
+	game.profiler.enabled = profile
+	inputs = collections.deque(log.inputs)
+	actions = game.get_key_actions()
+	while game.clock.ticks < log.ticks:
+		while inputs and inputs[0][0] <= game.clock.ticks:
+			actions[inputs.popleft()[1]]()
+		game.update()
+		if on_tick:
+			on_tick(game)
+	return game
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Space War in a turtle window")
+	parser.add_argument("preset", nargs="?", type=int, default=None,
+						help="index into game_options (default: options_standard)")
+	parser.add_argument("--seed", type=int, default=None)
+	parser.add_argument("--record", default=None, help="save the seed, options and key presses to this file on exit")
+	parser.add_argument("--replay", default=None, help="play a --record file back headless and print its timings")
+	parser.add_argument("--profile", action="store_true", help="also write the per-frame timings to CSV and JSON")
+	args = parser.parse_args()
+
+	if args.replay:
+		t = time.perf_counter()
+		game = replay(InputRecorder.load(args.replay), True)
+		t = time.perf_counter() - t
+		print("Replayed {} ticks in {:.2f} s ({:.0f} ticks/s)".format(game.clock.ticks, t, game.clock.ticks / t))
+		print("Score: {}  High Score: {}  Lives: {}".format(game.score, game.highScore, game.player.lives))
+		print("\nFrame Times (ms) and Counts:")
+		print(game.profiler.summary())
+		if args.profile:
+			game.dump_profile()
+	else:
+		options = game_options[args.preset] if args.preset is not None else options_standard
+		game = new_game(options, TurtleRenderer(), seed=args.seed)
+		if args.record:
+			game.start_recording(12)
+
+		# Keyboard Bindings
+		turtle.listen()
+		for key in game.get_key_actions():
+			turtle.onkey(lambda key=key: game.press(key), key)
+
+		turtle.onkey(game.exit_game, "q")
+		turtle.onkey(game.dump_profile, "d")
+
+		mem = []
+		process = psutil.Process(os.getpid())
+		mem.append(process.memory_info().rss)
+
+		GameLoop(game).run()
+		if game.recorder:
+			game.stop_recording(args.record)
+
+		print("\nStats:")
+		print("High Score: {}".format(game.highScore))
+		print("\nFrame Times (ms) and Counts:")
+		print(game.profiler.summary())
+		if args.profile:
+			game.dump_profile()
+		mem.append(process.memory_info().rss)
+		print("\nMemory Usage (MB):")
+		print("Start: {}\nEnd:   {}".format(round(mem[0]/1e6, 1), round(mem[1]/1e6, 1)))
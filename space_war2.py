@@ -16,15 +16,34 @@ Cleaner inheritances
 Similar params moved to tuples for cleaner code
 """
 
-import os, sys, time, psutil, gc
+import os, sys, time, psutil
 import math, random
 import turtle
 from collections import namedtuple
+import numpy as np
+
+import space_war
 
 
 class Geometry:
+    """
+    Geometry between anything with x, y and hdg attributes: Points, or sprites themselves, which keep their position
+    as plain attributes so nothing has to be built to measure between them.
+
+    Inner Classes:
+    Point: a fixed point, e.g. a spawn point or a screen corner.
+    Marker: a point that is moved in place, e.g. an aim point that changes every frame.
+    """
     Point = namedtuple('Point', 'x y hdg')
 
+    class Marker:
+        __slots__ = ('x', 'y', 'hdg')
+
+        def __init__(self, x=0., y=0., hdg=0.):
+            self.x = x
+            self.y = y
+            self.hdg = hdg
+
     @staticmethod
     def dist(pt1, pt2):
         """
@@ -64,7 +83,7 @@ class Geometry:
 		"""
 
         bounds = sprite1.size + sprite2.size
-        if Geometry.dist(sprite1.get_pos(), sprite2.get_pos()) < bounds:
+        if Geometry.dist(sprite1, sprite2) < bounds:
             return True
         return False
 
@@ -73,46 +92,98 @@ class Geometry:
         """
         Checks if sprite is in the rectangle defined by the two points. Ignores sprite size.
         """
-        pt = sprite.get_pos()
-        if min(pt1.x, pt2.x) < pt.x < max(pt1.x, pt2.x) and min(pt1.y, pt2.y) < pt.y < max(pt1.y, pt2.y):
+        if min(pt1.x, pt2.x) < sprite.x < max(pt1.x, pt2.x) and min(pt1.y, pt2.y) < sprite.y < max(pt1.y, pt2.y):
             return True
         return False
 
 class SpaceWar:
+    """
+    Sprites are kept in one list, in update order, and in a registry per type (players, enemies, projectiles, the
+    rest) so each collision pass only walks the sprites it can involve. add() and remove() are deferred: the changes
+    are applied between ticks, so nothing is added to or removed from a list while it is being walked.
+    """
     def __init__(self, running=True, frame_rate=30):
         turtle.speed(frame_rate)
         self.running = running
         self.sprites = []
+        self.players = []
+        self.enemies = []
+        self.projectile_sprites = []
+        self.other_sprites = []
+        self.to_add = []
+        self.to_remove = []
         self.bounds_x = 800  # based on window size
         self.bounds_y = 450  # based on window size
         self.bounds_ul = Geometry.Point(-self.bounds_x, self.bounds_y, 0)
         self.bounds_lr = Geometry.Point(self.bounds_x, -self.bounds_y, 0)
+        self.projectiles = ProjectilePool()
+        self.timers = space_war.Timers()
+        # the clock is read once per tick; statuses started between ticks count from the last one
+        self.now = time.time()
 
     def reset(self):
         pass
 
+    def registry(self, sprite):
+        if isinstance(sprite, Player):
+            return self.players
+        elif isinstance(sprite, Enemy):
+            return self.enemies
+        elif isinstance(sprite, Projectile):
+            return self.projectile_sprites
+        return self.other_sprites
+
+    def add(self, sprite):
+        self.to_add.append(sprite)
+
+    def remove(self, sprite):
+        self.to_remove.append(sprite)
+
+    def apply_pending(self):
+        for sprite in self.to_add:
+            self.sprites.append(sprite)
+            self.registry(sprite).append(sprite)
+        self.to_add.clear()
+        for sprite in self.to_remove:
+            # a sprite can be removed twice in a tick, e.g. a bomb that detonates as it leaves the screen
+            if sprite in self.sprites:
+                self.sprites.remove(sprite)
+                self.registry(sprite).remove(sprite)
+        self.to_remove.clear()
+
     def update_sprites(self):
+        # whatever was added or removed between ticks, e.g. by a key press
+        self.apply_pending()
+        self.now = time.time()
+        self.timers.run(self.now)
+        self.projectiles.update(self.now, self.bounds_ul, self.bounds_lr)
+        for bullet, e in self.projectiles.hits(self.enemies):
+            e.respawn()
+
         for sprite in self.sprites:
             if sprite.active:
                 sprite.update()
                 # bounds check
                 if not Geometry.is_in_rect(sprite, self.bounds_ul, self.bounds_lr):
                     sprite.respawn()
-                if isinstance(sprite, Player):
-                    if sprite.status_invuln.active:
-                        pass
-                    # check if enemies collided w/ player
-                    elif any([Geometry.is_collided(sprite, e) for e in self.sprites if isinstance(e, Enemy)]):
-                        sprite.set_status_invuln(3)
-                        sprite.respawn()
 
-                if isinstance(sprite, Projectile):
-                    for e in self.sprites:
-                        if isinstance(e, Enemy) and Geometry.is_collided(e, sprite):
-                            e.respawn()
-                            if isinstance(sprite, Bomb):
-                                sprite.detonate()
+        # check if enemies collided w/ player
+        for player in self.players:
+            if player.active and not player.status_invuln.active:
+                if any(Geometry.is_collided(player, e) for e in self.enemies):
+                    player.set_status_invuln(3)
+                    player.respawn()
+
+        for projectile in self.projectile_sprites:
+            for e in self.enemies:
+                if not projectile.active:
+                    break
+                if Geometry.is_collided(e, projectile):
+                    e.respawn()
+                    if isinstance(projectile, Bomb):
+                        projectile.detonate()
 
+        self.apply_pending()
 
 
     def update_text(self):
@@ -132,20 +203,46 @@ class Sprite(turtle.Turtle):
 
 	Inner Classes:
 	Image: for setting sprite shape and color together
-	Status: for tracking temporary true/false attributes of an instance. Statuses are then checked by
-		the update function of the class. Default tuple values are finnicky in Python, but most constructors should use:
-		(active, duration, time_activated) = (False, 0, float('-inf'))
+	Status: for tracking temporary true/false attributes of an instance. Starting a status schedules its expiry
+		with the game's timers, which stop it (and call its on_expire) when it runs out, so nothing polls it every
+		frame. Each sprite keeps its statuses for life and switches them on and off in place.
+
+	The position and heading are mirrored in plain x, y and hdg attributes (with the heading's unit vector in hx, hy),
+	which the game logic reads instead of asking the turtle.
 	"""
 
     Image = namedtuple('Image', [
         'shape',
         'color'
     ])
-    Status = namedtuple('Status', [
-        'active',
-        'duration',
-        'time_activated'
-    ])
+
+    flash_interval = 0.2
+
+    class Status:
+        __slots__ = ('active', 'duration', 'time_activated', 'on_expire')
+
+        def __init__(self, on_expire=None):
+            self.active = False
+            self.duration = 0.
+            self.time_activated = float('-inf')
+            self.on_expire = on_expire
+
+        def start(self, duration):
+            self.active = True
+            self.duration = duration
+            self.time_activated = game.now
+            game.timers.schedule(self, self.time_activated + duration, self.expire)
+
+        def stop(self):
+            self.active = False
+            self.duration = 0.
+            self.time_activated = float('-inf')
+            game.timers.cancel(self)
+
+        def expire(self):
+            self.stop()
+            if self.on_expire:
+                self.on_expire()
 
     def __init__(self, pos, image, size=10, active=True):
         turtle.Turtle.__init__(self, shape=image[0])
@@ -157,7 +254,8 @@ class Sprite(turtle.Turtle):
         self.color(image.color)
         self.size = size
 
-        self.status_flashing = Sprite.Status(False, 0., float('-inf'))
+        self.status_flashing = Sprite.Status(self.end_flashing)
+        self.flashed = False
         self.start_color = image.color
 
     def set_pos(self, pos=Geometry.Point(0, 0, 0)):
@@ -165,24 +263,49 @@ class Sprite(turtle.Turtle):
         self.setheading(pos.hdg)
 
     def get_pos(self):
-        return Geometry.Point(self.xcor(), self.ycor(), self.heading())
+        return Geometry.Point(self.x, self.y, self.hdg)
+
+    def goto(self, x, y=None):
+        if y is None:
+            x, y = x
+        self.x = x
+        self.y = y
+        turtle.Turtle.goto(self, x, y)
+
+    def setheading(self, hdg):
+        self.hdg = hdg % 360
+        self.hx = math.cos(math.pi / 180 * self.hdg)
+        self.hy = math.sin(math.pi / 180 * self.hdg)
+        turtle.Turtle.setheading(self, self.hdg)
+
+    def fd(self, distance):
+        self.goto(self.x + distance * self.hx, self.y + distance * self.hy)
+
+    def lt(self, angle):
+        self.setheading(self.hdg + angle)
+
+    def rt(self, angle):
+        self.setheading(self.hdg - angle)
 
     def set_status_flashing(self, seconds=3):
-        self.status_flashing = Sprite.Status(True, seconds, time.time())
+        if not self.status_flashing.active:
+            self.flashed = False
+            self.color(self.start_color)
+            game.timers.schedule((self, "flash"), game.now + Sprite.flash_interval / 2, self.flash)
+        self.status_flashing.start(seconds)
+
+    def flash(self):
+        # black for the second half of every flash interval
+        self.flashed = not self.flashed
+        self.color("black" if self.flashed else self.start_color)
+        game.timers.schedule((self, "flash"), game.now + Sprite.flash_interval / 2, self.flash)
+
+    def end_flashing(self):
+        game.timers.cancel((self, "flash"))
+        self.color(self.start_color)
 
     def update(self):
-        if self.status_flashing.active:
-            # deactivate
-            if time.time() - self.status_flashing.time_activated > self.status_flashing.duration:
-                self.status_flashing = Sprite.Status(False, 0., float('-inf'))
-                self.color(self.start_color)
-            # still active
-            else:
-                flash_interval = 0.2
-                if (time.time() - self.status_flashing.time_activated) % flash_interval > flash_interval / 2:
-                    self.color("black")
-                else:
-                    self.color(self.start_color)
+        pass
 
 
 class Agent(Sprite):
@@ -209,26 +332,23 @@ class Agent(Sprite):
         self.respawn_delay = respawn_delay
         self.speed_limits = speed_limits
         self.lives = lives
-        self.status_cant_move = Agent.Status(False, 0., float('-inf'))
+        self.status_cant_move = Agent.Status()
 
         # agent targets itself to start; targeting requires high-level logic and may change over time, so it
         # will be done with a separate method
         # aim pt drawing will be done with a high-level turtle
         self.target = self
         self.guidance_mode = 0
-        self.aim_pt = pos
+        self.aim_pt = Geometry.Marker(pos.x, pos.y)
 
         # keeps the agent from firing a weapon until a certain amount of time has passed
-        self.status_cant_fire = Agent.Status(False, 0., float('-inf'))
+        self.status_cant_fire = Agent.Status()
         self.rof = rof
         self.bullet_speed = 30
 
     def update(self):
         if not self.status_cant_move.active:
             self.move()
-        if self.status_cant_fire.active:
-            if time.time() - self.status_cant_fire.time_activated > self.status_cant_fire.duration:
-                self.status_cant_fire = Agent.Status(False, 0., float('-inf'))
 
         super().update()
 
@@ -247,27 +367,25 @@ class Agent(Sprite):
 
     def fire_bullet(self):
         if not self.status_cant_fire.active:
-            self.status_cant_fire = Sprite.Status(True, 1 / max(self.rof, 1e-6), time.time())
+            self.status_cant_fire.start(1 / max(self.rof, 1e-6))
             bullet_img = Sprite.Image("triangle","yellow")
             bullet_speed = self.speed + self.bullet_speed
-            bullet = Bullet(self.get_pos(), bullet_img, self, bullet_speed)
-            game.sprites.append(bullet)
+            game.projectiles.spawn(self.get_pos(), bullet_img, self, bullet_speed)
 
     def fire_bounce(self):
         if not self.status_cant_fire.active:
-            self.status_cant_fire = Sprite.Status(True, 1 / max(self.rof, 1e-6), time.time())
+            self.status_cant_fire.start(1 / max(self.rof, 1e-6))
             bullet_img = Sprite.Image("circle", "magenta")
             bullet_speed = self.speed + self.bullet_speed / 2
-            bullet = Bullet(self.get_pos(), bullet_img, self, bullet_speed, 20)
-            game.sprites.append(bullet)
+            game.projectiles.spawn(self.get_pos(), bullet_img, self, bullet_speed, 20)
 
     def fire_bomb(self):
         if not self.status_cant_fire.active:
-            self.status_cant_fire = Sprite.Status(True, 1 / max(self.rof, 1e-6), time.time())
+            self.status_cant_fire.start(1 / max(self.rof, 1e-6))
             bullet_img = Sprite.Image("circle", "red")
             bullet_speed = self.bullet_speed
             bullet = Bomb(self.get_pos(), bullet_img, self, bullet_speed)
-            game.sprites.append(bullet)
+            game.add(bullet)
 
 class Player(Agent):
     def __init__(self, pos=Geometry.Point(0, -100, 90), image=Sprite.Image("triangle", "cyan"), speed=4,
@@ -277,15 +395,9 @@ class Player(Agent):
         self.score = 0
         self.high_score = 0
         self.bombs = 3
-        self.status_invuln = Player.Status(False, 0., float('-inf'))
+        self.status_invuln = Player.Status()
         self.is_on_autopilot = False
 
-    def update(self):
-        if self.status_invuln.active:
-            if time.time() - self.status_invuln.time_activated > self.status_invuln.duration:
-                self.status_invuln = Player.Status(False, 0., float('-inf'))
-        super().update()
-
     def turn_left(self):
         self.lt(self.speed_limits.max_turn_speed)
 
@@ -299,7 +411,7 @@ class Player(Agent):
         self.speed -= 1
 
     def set_status_invuln(self, seconds):
-        self.status_invuln = Player.Status(True, seconds, time.time())
+        self.status_invuln.start(seconds)
         self.set_status_flashing(seconds)
 
 
@@ -311,17 +423,11 @@ class Enemy(Agent):
         Agent.__init__(self, pos, image, speed, respawn_delay, speed_limits, lives, rof)
         # TODO: fix color/guidance dependency
         self.color(Enemy.color_dict[self.guidance_mode % len(Enemy.color_dict)])
-        self.status_scattered = Enemy.Status(False, 0., float('-inf'))
+        self.status_scattered = Enemy.Status(self.end_scattered)
         self.guidance_mode_start = self.guidance_mode
         self.random_steps = 50
 
     def update(self):
-        if self.status_scattered.active:
-            # try to deactivate
-            if time.time() - self.status_scattered.time_activated > self.status_scattered.duration:
-                self.status_scattered = Sprite.Status(False, 0., float('-inf'))
-                self.set_guidance(self.guidance_mode_start)
-                self.speed *= 2
         self.guidance()
         self.autopilot()
         self.weapons()
@@ -342,8 +448,10 @@ class Enemy(Agent):
         4: Mirror. Moves to opposite side of space from player.
         5: Avoidance. Moves away from player.
         """
-        px, py, p_hdg = self.target.get_pos()
-        ax, ay, a_hdg = self.get_pos()
+        px = self.target.x
+        py = self.target.y
+        ax = self.x
+        ay = self.y
 
         if self.guidance_mode == 1:
             ax = self.aim_pt.x + random.randint(-10, 10)
@@ -378,14 +486,14 @@ class Enemy(Agent):
             When N = 1, c = b, and the equation becomes linear:
             b = a/2cos(C), C != +/- 90
             """
-            p_dist = Geometry.dist(self.get_pos(), self.target.get_pos())
+            p_dist = Geometry.dist(self, self.target)
             N = self.target.speed / max(self.speed, 1)
             aim_dist = 0
 
             # if player is not moving, aim directly at it
             if abs(N) > 0:
                 c0 = -(p_dist ** 2)
-                c1 = 2 * p_dist * math.cos(math.pi / 180 * Geometry.brg_relative(self.get_pos(), self.target.get_pos()))
+                c1 = 2 * p_dist * math.cos(math.pi / 180 * Geometry.brg_relative(self, self.target))
                 c2 = 1 / (N ** 2) - 1
 
                 # N == +/-1; edge case
@@ -401,8 +509,8 @@ class Enemy(Agent):
                 if self.target.speed < 0:
                     aim_dist *= -1
 
-            ax = px + math.cos(math.pi / 180 * self.target.heading()) * aim_dist
-            ay = py + math.sin(math.pi / 180 * self.target.heading()) * aim_dist
+            ax = px + self.target.hx * aim_dist
+            ay = py + self.target.hy * aim_dist
 
         elif self.guidance_mode == 4:
             """
@@ -418,26 +526,29 @@ class Enemy(Agent):
             ax = 2 * ax - px
             ay = 2 * ay - py
 
-        self.aim_pt = Geometry.Point(ax, ay, 0)
+        self.aim_pt.x = ax
+        self.aim_pt.y = ay
 
     def autopilot(self):
-        command = 0.5 * Geometry.brg_relative(self.get_pos(), self.aim_pt)
+        command = 0.5 * Geometry.brg_relative(self, self.aim_pt)
         self.lt(max(min(self.speed_limits.max_turn_speed, command), -self.speed_limits.max_turn_speed))
 
     def weapons(self):
-        pa = self.get_pos()
-        pt = self.target.get_pos()
-        if abs(Geometry.brg_relative(pa, pt)) < 3:
-            if Geometry.dist(pa, pt) < self.size * 6:
+        if abs(Geometry.brg_relative(self, self.target)) < 3:
+            if Geometry.dist(self, self.target) < self.size * 6:
                 self.fire_bounce()
             else:
                 self.fire_bullet()
 
     def set_status_scattered(self, seconds=3):
-        self.status_scattered = Enemy.Status(True, seconds, time.time())
+        self.status_scattered.start(seconds)
         self.set_guidance(5)
         self.speed *= 0.5
 
+    def end_scattered(self):
+        self.set_guidance(self.guidance_mode_start)
+        self.speed *= 2
+
 
 class Prize(Agent):
     pass
@@ -456,28 +567,114 @@ class Projectile(Sprite):
         self.goto(1000, 1000)
         self.active = False
         self.clear()
-        try:
-            game.sprites.remove(self)
-        except:
-            pass
-        gc.collect()
+        game.remove(self)
 
     def wall_hit(self):
         pass
 
 class Bullet(Projectile):
+    """
+    Bullets are moved by the ProjectilePool, not by their own update. The turtle is only used to draw them.
+    """
+    lifetime = 30 # seconds
+
     def __init__(self, pos, image, fired_by=None, speed=30, bounces=0):
         Projectile.__init__(self, pos, image, fired_by, speed, bounces)
         self.shapesize(stretch_wid=0.3, stretch_len=0.4, outline=None)
         self.size = 2
-        self.lifetime = 30 # seconds
 
-    def update(self):
-        self.move()
-        super().update()
 
-    def move(self):
-        self.fd(self.speed)
+class ProjectilePool:
+    """
+    Fixed-capacity bullet state kept as parallel NumPy arrays, so every live bullet is moved, bounds-checked and
+    expired with a few array operations per tick. Free slots sit on a stack for O(1) spawn and removal, and each slot
+    keeps its Bullet turtle once made, hiding it when the slot is freed and showing it again on reuse. Shots are
+    dropped while every slot is taken.
+    """
+    fields = {"x": float, "y": float, "prev_x": float, "prev_y": float, "hdg": float, "speed": float,
+              "bounces": np.int64, "spawn_time": float, "active": bool}
+
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        for name, dtype in ProjectilePool.fields.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        # turtles are slow to make, so they're only created the first time a slot is used
+        self.bullets = [None] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def spawn_burst(self, pos, image, fired_by, speed, headings, bounces=0):
+        """
+        Insert one bullet per heading, all starting at pos.
+        """
+        headings = (np.asarray(headings, dtype=float) % 360)[:len(self.free)]
+        slots = np.array([self.free.pop() for _ in range(len(headings))], dtype=int)
+        self.x[slots] = self.prev_x[slots] = pos.x
+        self.y[slots] = self.prev_y[slots] = pos.y
+        self.hdg[slots] = headings
+        self.speed[slots] = speed
+        self.bounces[slots] = bounces
+        self.spawn_time[slots] = game.now
+        self.active[slots] = True
+
+        for slot, hdg in zip(slots.tolist(), headings.tolist()):
+            bullet_pos = Geometry.Point(pos.x, pos.y, hdg)
+            bullet = self.bullets[slot]
+            if bullet is None:
+                bullet = Bullet(bullet_pos, image, fired_by, speed, bounces)
+                self.bullets[slot] = bullet
+            else:
+                bullet.shape(image.shape)
+                bullet.color(image.color)
+                bullet.set_pos(bullet_pos)
+                bullet.showturtle()
+            bullet.fired_by = fired_by
+            bullet.active = True
+        return slots
+
+    def spawn(self, pos, image, fired_by, speed, bounces=0):
+        slots = self.spawn_burst(pos, image, fired_by, speed, [pos.hdg], bounces)
+        return slots[0] if len(slots) else None
+
+    def update(self, now, bounds_ul, bounds_lr):
+        expired = (now - self.spawn_time > Bullet.lifetime) | \
+                  ~((bounds_ul.x < self.x) & (self.x < bounds_lr.x) & (bounds_lr.y < self.y) & (self.y < bounds_ul.y))
+        for slot in np.flatnonzero(self.active & expired).tolist():
+            self.remove(slot)
+
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+        live = np.flatnonzero(self.active)
+        rad = self.hdg[live] * (math.pi / 180)
+        self.x[live] += self.speed[live] * np.cos(rad)
+        self.y[live] += self.speed[live] * np.sin(rad)
+        for slot, x, y in zip(live.tolist(), self.x[live].tolist(), self.y[live].tolist()):
+            self.bullets[slot].goto(x, y)
+
+    def hits(self, sprites):
+        """
+        (bullet, sprite) pairs that touched at any point during the bullet's last move, earliest first, found with one
+        broadcast over all live bullets. Each bullet is swept from its previous position, so a fast bullet can't hop
+        over a sprite; the sprites are taken to be standing still.
+        """
+        live = np.flatnonzero(self.active)
+        if len(live) == 0 or len(sprites) == 0:
+            return []
+        sx = np.array([sprite.x for sprite in sprites])
+        sy = np.array([sprite.y for sprite in sprites])
+        bounds = np.array([sprite.size for sprite in sprites]) + np.array([self.bullets[i].size for i in live])[:, None]
+        ex = (self.x[live] - self.prev_x[live])[:, None]
+        ey = (self.y[live] - self.prev_y[live])[:, None]
+        t = space_war.sweep_circle(self.prev_x[live, None] - sx, self.prev_y[live, None] - sy, ex, ey, bounds)
+        i, j = np.nonzero(np.isfinite(t))
+        order = np.argsort(t[i, j], kind="stable")
+        return [(self.bullets[k], sprites[m]) for k, m in zip(live[i[order]].tolist(), j[order].tolist())]
+
+    def remove(self, slot):
+        if self.active[slot]:
+            self.active[slot] = False
+            self.bullets[slot].active = False
+            self.bullets[slot].hideturtle()
+            self.free.append(slot)
 
 class Bomb(Projectile):
     def __init__(self, pos, image, fired_by=None, speed=10, bounces=0):
@@ -487,10 +684,11 @@ class Bomb(Projectile):
         self.speed_decay = 0.9 # how quickly does the bomb slow down
         self.fragments = 20 # how many bullets does it make
         self.set_status_flashing(self.lifetime - 1)
+        game.timers.schedule((self, "fuse"), game.now + self.lifetime, self.detonate)
 
     def update(self):
-        # conditions to detonate
-        if time.time() - self.spawn_time > self.lifetime or self.bounces < 0:
+        # the fuse is on the game's timers; running out of bounces sets it off early
+        if self.bounces < 0:
             self.detonate()
         self.move()
         super().update()
@@ -500,11 +698,10 @@ class Bomb(Projectile):
         self.fd(self.speed)
 
     def detonate(self):
-        for fragment in range(0, 360, int(360/self.fragments)):
-            bullet_img = Sprite.Image("triangle","yellow")
-            bullet_hdg = Geometry.Point(self.get_pos().x, self.get_pos().y, fragment)
-            bullet = Bullet(bullet_hdg, bullet_img, self.fired_by)
-            game.sprites.append(bullet)
+        game.timers.cancel((self, "fuse"))
+        bullet_img = Sprite.Image("triangle","yellow")
+        game.projectiles.spawn_burst(self.get_pos(), bullet_img, self.fired_by, 30,
+                                     range(0, 360, int(360/self.fragments)))
         self.respawn()
 
 class Wall(Sprite):
@@ -527,13 +724,13 @@ wn.colormode(255)
 
 game = SpaceWar()
 player = Player()
-game.sprites.append(player)
+game.add(player)
 for i in range(6):
     enemy = Enemy()
     enemy.set_guidance(i)
     enemy.speed = 2 + i/2
     enemy.target = player
-    game.sprites.append(enemy)
+    game.add(enemy)
 
 # Keys
 turtle.onkey(game.exit_game, "q")
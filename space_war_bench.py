@@ -0,0 +1,144 @@
+# Space War benchmark
+# Plays many headless matches of each options_* preset and reports how fast they simulate and how the player fares.
+
+import time, argparse
+import random
+import multiprocessing
+import numpy as np
+
+import space_war
+
+class RandomPilot():
+	'''
+	Mashes keys: each tick there is a chance of one random key press.
+	'''
+	keys = ["Left", "Right", "Up", "Down", "z", "x", "space"]
+
+	def __init__(self, seed, press_chance=0.3):
+		self.rng = random.Random(seed)
+		self.press_chance = press_chance
+
+	def act(self, game):
+		if self.rng.random() < self.press_chance:
+			game.press(self.rng.choice(RandomPilot.keys))
+
+class ScriptedPilot():
+	'''
+	Turns toward the nearest enemy and fires once roughly lined up. Bombs when an enemy gets close.
+	'''
+	def __init__(self, seed):
+		pass
+
+	def act(self, game):
+		player = game.player
+		enemies = [actor for actor in game.actors if isinstance(actor, space_war.Enemy)]
+		if not enemies:
+			return
+		target = min(enemies, key=lambda e: player.distance(e.xcor(), e.ycor()))
+		dist = player.distance(target.xcor(), target.ycor())
+		error = player.brg_error(target.xcor(), target.ycor())
+		if dist < 4 * target.size and player.bombs > 0:
+			game.press("space")
+		elif error > player.max_turn_speed / 2:
+			game.press("Left")
+		elif error < -player.max_turn_speed / 2:
+			game.press("Right")
+		elif dist > 200 and player.speed < 4:
+			game.press("Up")
+		else:
+			game.press("z")
+
+class AutoPilot():
+	'''
+	Hands the ship to Player.autopilot.
+	'''
+	def __init__(self, seed):
+		pass
+
+	def act(self, game):
+		if not game.player.on_autopilot:
+			game.press("a")
+
+pilots = {"random": RandomPilot, "scripted": ScriptedPilot, "auto": AutoPilot}
+preset_names = ["trivial", "easy", "standard", "hard", "diabolical", "test"]
+
+def play_match(job):
+	'''
+	One headless match. It ends when the player runs out of lives or after max_ticks. Runs in a worker process, so
+	everything it needs comes in through job.
+	'''
+	preset, seed, max_ticks, pilot_name, num_enemies = job
+	game = space_war.new_game(space_war.game_options[preset], num_enemies=num_enemies, seed=seed)
+	pilot = pilots[pilot_name](seed)
+	collision_tests = 0
+	peak_bullets = 0
+	survival_ticks = max_ticks
+
+	t = time.perf_counter()
+	while game.clock.ticks < max_ticks:
+		pilot.act(game)
+		game.update()
+		collision_tests += game.profiler.current["collision_tests"]
+		peak_bullets = max(peak_bullets, len(game.bullets))
+		# reset_game is how the game ends a life-less player
+		if game.resets > 1:
+			survival_ticks = game.clock.ticks
+			break
+	t = time.perf_counter() - t
+
+	return {
+		"preset": preset,
+		"pilot": pilot_name,
+		"seed": seed,
+		"ticks": game.clock.ticks,
+		"wall_time": t,
+		"collision_tests": collision_tests,
+		"peak_bullets": peak_bullets,
+		"survival_time": survival_ticks * game.clock.tick_time,
+		"high_score": game.highScore
+	}
+
+def run_benchmark(presets, matches, max_ticks, pilot, num_enemies=12, processes=None, seed=0):
+	jobs = [(preset, seed + i, max_ticks, pilot, num_enemies) for preset in presets for i in range(matches)]
+	with multiprocessing.Pool(processes) as pool:
+		results = pool.map(play_match, jobs)
+
+	report = {}
+	for preset in presets:
+		runs = [r for r in results if r["preset"] == preset]
+		wall_time = sum(r["wall_time"] for r in runs)
+		survival = np.array([r["survival_time"] for r in runs])
+		report[preset] = {
+			"matches": len(runs),
+			"ticks_per_s": sum(r["ticks"] for r in runs) / wall_time,
+			"collision_tests_per_s": sum(r["collision_tests"] for r in runs) / wall_time,
+			"peak_bullets": max(r["peak_bullets"] for r in runs),
+			"survival_mean": survival.mean(),
+			"survival_min": survival.min(),
+			"high_score_mean": np.mean([r["high_score"] for r in runs])
+		}
+	return report
+
+def print_report(report, max_ticks):
+	print("{:<12}{:>8}{:>12}{:>16}{:>8}{:>14}{:>14}{:>12}".format(
+		"preset", "matches", "ticks/s", "coll. tests/s", "peak", "survival (s)", "min surv (s)", "score"))
+	for preset, r in report.items():
+		print("{:<12}{:>8}{:>12.0f}{:>16.0f}{:>8}{:>14.1f}{:>14.1f}{:>12.0f}".format(
+			preset_names[preset], r["matches"], r["ticks_per_s"], r["collision_tests_per_s"], r["peak_bullets"],
+			r["survival_mean"], r["survival_min"], r["high_score_mean"]))
+	print("(matches stop at {} ticks; peak is the most live bullets in any one match)".format(max_ticks))
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Headless Monte-Carlo benchmark of the space_war presets")
+	parser.add_argument("presets", nargs="*", type=int, default=list(range(len(space_war.game_options))),
+						help="indexes into space_war.game_options (default: all)")
+	parser.add_argument("-n", "--matches", type=int, default=8, help="matches per preset")
+	parser.add_argument("-t", "--ticks", type=int, default=3000, help="longest match, in ticks")
+	parser.add_argument("-e", "--enemies", type=int, default=12)
+	parser.add_argument("-p", "--pilot", choices=sorted(pilots), default="random")
+	parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes (default: one per core)")
+	parser.add_argument("-s", "--seed", type=int, default=0, help="seed of the first match; the rest count up")
+	args = parser.parse_args()
+
+	print_report(run_benchmark(args.presets, args.matches, args.ticks, args.pilot, args.enemies, args.processes,
+							   args.seed), args.ticks)
@@ -0,0 +1,283 @@
+# Space War environments
+# Gym-style reset()/step() over the headless simulation, one game at a time or K games in lockstep, for training agents.
+
+import time, argparse
+import random
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+import space_war
+
+# one key press per step; None steps without pressing anything
+actions = (None, "Left", "Right", "Up", "Down", "z", "x", "space")
+
+def observation_spec(num_enemies, max_bullets, num_walls):
+	'''
+	Shape and dtype of each observation array. Rows past the live bullets are zeros, with a 0 in the last column.
+	player: x, y, heading x, heading y, speed, lives, bombs, invulnerable
+	enemies: x, y, heading x, heading y, speed, scattered
+	bullets: x, y, heading x, heading y, live
+	walls: x1, y1, x2, y2, bounce mode
+	'''
+	return {
+		"player": ((8,), np.float32),
+		"enemies": ((num_enemies, 6), np.float32),
+		"bullets": ((max_bullets, 5), np.float32),
+		"walls": ((num_walls, 5), np.float32)
+	}
+
+class SpaceWarEnv():
+	'''
+	One headless game per episode. step() takes an index into actions, presses that key, runs frame_skip ticks and
+	returns (observation, reward, terminated, truncated, info) like a gym environment. The reward is the change in
+	score; the episode ends when the player runs out of lives, or is cut off after max_ticks ticks.
+
+	Each reset starts a new game from the next seed of the environment's own generator, so a run of episodes is the
+	same for the same seed.
+	'''
+	def __init__(self, preset=2, num_enemies=12, max_bullets=64, max_ticks=3000, frame_skip=1, seed=None):
+		self.options = space_war.game_options[preset]
+		self.num_enemies = num_enemies
+		self.max_bullets = max_bullets
+		self.max_ticks = max_ticks
+		self.frame_skip = frame_skip
+		self.rng = random.Random(seed)
+		num_walls = len(space_war.new_game(self.options, num_enemies=0, seed=0).walls)
+		self.spec = observation_spec(num_enemies, max_bullets, num_walls)
+		self.obs = {name: np.zeros(shape, dtype) for name, (shape, dtype) in self.spec.items()}
+		self.game = None
+		self.enemies = []
+		self.score = 0
+
+	def reset(self, seed=None, out=None):
+		'''
+		Starts a new game. The observation is written into out (a dict of arrays shaped like spec) when given, and
+		into the environment's own arrays otherwise.
+		'''
+		seed = seed if seed is not None else self.rng.randrange(2**32)
+		self.game = space_war.new_game(self.options, num_enemies=self.num_enemies, seed=seed)
+		self.enemies = [actor for actor in self.game.actors if isinstance(actor, space_war.Enemy)]
+		self.score = self.game.score
+		obs = out if out is not None else self.obs
+		obs["walls"][:] = [(wall.x1, wall.y1, wall.x2, wall.y2, wall.bounce_mode) for wall in self.game.walls]
+		self.observe(obs)
+		return obs, {"seed": seed}
+
+	def step(self, action, out=None):
+		game = self.game
+		key = actions[action]
+		if key:
+			game.press(key)
+		for _ in range(self.frame_skip):
+			game.update()
+			# reset_game is how the game ends a life-less player
+			if game.resets > 1:
+				break
+		terminated = game.resets > 1
+		# by now a finished game's score has been cleared, but reset_game kept it
+		score = game.last_score if terminated else game.score
+		reward = score - self.score
+		self.score = score
+		truncated = not terminated and game.clock.ticks >= self.max_ticks
+		obs = out if out is not None else self.obs
+		self.observe(obs)
+		return obs, reward, terminated, truncated, {"ticks": game.clock.ticks, "high_score": game.highScore}
+
+	def observe(self, obs):
+		game = self.game
+		player = game.player
+		obs["player"][:] = (player.x, player.y, player.hx, player.hy, player.speed, player.lives, player.bombs,
+							player.is_invuln)
+		if self.enemies:
+			obs["enemies"][:] = [(e.x, e.y, e.hx, e.hy, e.speed, e.scattered) for e in self.enemies]
+
+		pool = game.bullets
+		slots = np.flatnonzero(pool.active)[:self.max_bullets]
+		n = len(slots)
+		rad = pool.hdg[slots] * (np.pi / 180)
+		bullets = obs["bullets"]
+		bullets[:n, 0] = pool.x[slots]
+		bullets[:n, 1] = pool.y[slots]
+		bullets[:n, 2] = np.cos(rad)
+		bullets[:n, 3] = np.sin(rad)
+		bullets[:n, 4] = 1
+		bullets[n:] = 0
+
+class VecEnv():
+	'''
+	K environments stepped in lockstep in this process. Observations come back stacked, one (K, ...) array per
+	field, with rewards, terminated and truncated as length-K arrays. An environment whose episode ends is reset
+	straight away: its row then holds the first observation of the next episode, and its info the final score.
+	'''
+	def __init__(self, num_envs, seed=0, **env_args):
+		self.envs = [SpaceWarEnv(seed=seed + i, **env_args) for i in range(num_envs)]
+		self.spec = self.envs[0].spec
+		self.obs = {name: np.zeros((num_envs,) + shape, dtype) for name, (shape, dtype) in self.spec.items()}
+		self.rewards = np.zeros(num_envs)
+		self.terminated = np.zeros(num_envs, dtype=bool)
+		self.truncated = np.zeros(num_envs, dtype=bool)
+
+	def __len__(self):
+		return len(self.envs)
+
+	def reset(self):
+		infos = [env.reset(out=row(self.obs, i))[1] for i, env in enumerate(self.envs)]
+		return self.obs, infos
+
+	def step(self, actions):
+		infos = step_envs(self.envs, actions, self.obs, self.rewards, self.terminated, self.truncated, 0)
+		return self.obs, self.rewards, self.terminated, self.truncated, infos
+
+	def close(self):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+def row(obs, i):
+	return {name: array[i] for name, array in obs.items()}
+
+def step_envs(envs, actions, obs, rewards, terminated, truncated, first):
+	'''
+	Steps envs, which fill rows first onwards of the shared arrays, and resets the ones that finished.
+	'''
+	infos = []
+	for i, env in enumerate(envs, first):
+		out = row(obs, i)
+		_, rewards[i], terminated[i], truncated[i], info = env.step(int(actions[i]), out)
+		if terminated[i] or truncated[i]:
+			info["final_score"] = env.score
+			env.reset(out=out)
+		infos.append(info)
+	return infos
+
+def shared_arrays(names, spec, num_envs):
+	'''
+	Maps the shared memory blocks named in names onto arrays: one (num_envs, ...) array per observation field, then
+	actions, rewards, terminated and truncated. Returns the blocks, which have to stay open while the arrays are used,
+	and the arrays.
+	'''
+	layout = {name: ((num_envs,) + shape, dtype) for name, (shape, dtype) in spec.items()}
+	layout.update(actions=((num_envs,), np.int64), rewards=((num_envs,), float), terminated=((num_envs,), bool),
+				  truncated=((num_envs,), bool))
+	blocks = {}
+	arrays = {}
+	for name, (shape, dtype) in layout.items():
+		if names is None:
+			size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+			blocks[name] = shared_memory.SharedMemory(create=True, size=size)
+		else:
+			blocks[name] = shared_memory.SharedMemory(name=names[name])
+		arrays[name] = np.ndarray(shape, dtype, buffer=blocks[name].buf)
+	return blocks, arrays
+
+def env_worker(conn, names, num_envs, first, count, seed, env_args):
+	'''
+	Runs envs first to first + count of a SharedMemoryVecEnv. Commands come in over conn; observations, rewards and
+	flags are written straight into the shared arrays and only the infos go back over the pipe.
+	'''
+	envs = [SpaceWarEnv(seed=seed + i, **env_args) for i in range(first, first + count)]
+	blocks, arrays = shared_arrays(names, envs[0].spec, num_envs)
+	obs = {name: arrays[name] for name in envs[0].spec}
+	while True:
+		command = conn.recv()
+		if command == "reset":
+			conn.send([env.reset(out=row(obs, i))[1] for i, env in enumerate(envs, first)])
+		elif command == "step":
+			conn.send(step_envs(envs, arrays["actions"], obs, arrays["rewards"], arrays["terminated"],
+								arrays["truncated"], first))
+		else:
+			break
+	# drop the views before closing the blocks under them
+	del obs, arrays
+	for block in blocks.values():
+		block.close()
+	conn.close()
+
+class SharedMemoryVecEnv(VecEnv):
+	'''
+	VecEnv with the environments spread over worker processes. The stacked observations, actions, rewards and flags
+	live in shared memory: workers write their rows in place, so a step only sends a command and the small infos
+	through each pipe, and the arrays step() returns are views of the shared blocks (overwritten by the next step).
+	'''
+	def __init__(self, num_envs, processes=None, seed=0, **env_args):
+		processes = min(processes or multiprocessing.cpu_count(), num_envs)
+		self.spec = SpaceWarEnv(**env_args).spec
+		self.blocks, self.arrays = shared_arrays(None, self.spec, num_envs)
+		self.obs = {name: self.arrays[name] for name in self.spec}
+		self.rewards = self.arrays["rewards"]
+		self.terminated = self.arrays["terminated"]
+		self.truncated = self.arrays["truncated"]
+		self.num_envs = num_envs
+		names = {name: block.name for name, block in self.blocks.items()}
+		self.conns = []
+		self.workers = []
+		for k in range(processes):
+			first = num_envs * k // processes
+			count = num_envs * (k + 1) // processes - first
+			conn, worker_conn = multiprocessing.Pipe()
+			worker = multiprocessing.Process(target=env_worker, args=(worker_conn, names, num_envs, first, count,
+																	  seed, env_args), daemon=True)
+			worker.start()
+			self.conns.append(conn)
+			self.workers.append(worker)
+
+	def __len__(self):
+		return self.num_envs
+
+	def gather(self, command):
+		for conn in self.conns:
+			conn.send(command)
+		return [info for conn in self.conns for info in conn.recv()]
+
+	def reset(self):
+		return self.obs, self.gather("reset")
+
+	def step(self, actions):
+		self.arrays["actions"][:] = actions
+		infos = self.gather("step")
+		return self.obs, self.rewards, self.terminated, self.truncated, infos
+
+	def close(self):
+		if not self.workers:
+			return
+		for conn in self.conns:
+			conn.send("close")
+		for worker in self.workers:
+			worker.join()
+		self.workers = []
+		del self.obs, self.rewards, self.terminated, self.truncated, self.arrays
+		for block in self.blocks.values():
+			block.close()
+			block.unlink()
+
+def measure(env, steps, seed=0):
+	'''
+	Env-steps per second of env under uniformly random actions.
+	'''
+	rng = np.random.default_rng(seed)
+	env.reset()
+	t = time.perf_counter()
+	for _ in range(steps):
+		env.step(rng.integers(len(actions), size=len(env)))
+	return steps * len(env) / (time.perf_counter() - t)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Env-steps/s of the space_war environments under random actions")
+	parser.add_argument("preset", nargs="?", type=int, default=2, help="index into space_war.game_options")
+	parser.add_argument("-k", "--envs", type=int, default=8, help="environments stepped in lockstep")
+	parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes (default: one per core)")
+	parser.add_argument("-t", "--steps", type=int, default=500, help="lockstep steps to time")
+	parser.add_argument("-e", "--enemies", type=int, default=12)
+	parser.add_argument("-f", "--frame-skip", type=int, default=1, help="ticks per step")
+	args = parser.parse_args()
+
+	env_args = {"preset": args.preset, "num_enemies": args.enemies, "frame_skip": args.frame_skip}
+	with VecEnv(args.envs, **env_args) as env:
+		print("in-process:    {:>10.0f} env-steps/s".format(measure(env, args.steps)))
+	with SharedMemoryVecEnv(args.envs, args.processes, **env_args) as env:
+		print("shared memory: {:>10.0f} env-steps/s".format(measure(env, args.steps)))
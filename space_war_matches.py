@@ -0,0 +1,80 @@
+# Space War match runner
+# Hosts many independent headless matches across a process pool and streams back each result as its match ends.
+
+import os, argparse, json
+import queue
+import multiprocessing
+import numpy as np
+
+import space_war
+import space_war_bench
+
+def init_worker(results):
+	# the results queue has to reach the workers when they start; it can't be passed along with each job
+	global match_results
+	match_results = results
+
+def report_match(job):
+	match_results.put(space_war_bench.play_match(job))
+
+def run_matches(jobs, processes=None):
+	'''
+	Plays every job (preset, seed, max_ticks, pilot, num_enemies) across a process pool and yields each result as
+	soon as its match is over, in the order they finish. A match that raises stops the run with its exception.
+	'''
+	results = multiprocessing.Queue()
+	with multiprocessing.Pool(processes, init_worker, (results,)) as pool:
+		pending = pool.map_async(report_match, jobs)
+		received = 0
+		while received < len(jobs):
+			try:
+				result = results.get(timeout=0.1)
+			except queue.Empty:
+				if pending.ready():
+					# re-raises whatever a worker raised
+					pending.get()
+				continue
+			received += 1
+			yield result
+
+def tournament(presets, pilot_names, matches, max_ticks, num_enemies=12, processes=None, seed=0, out=None):
+	'''
+	Every pilot plays matches matches against the enemies of every preset. Returns a table keyed by (pilot, preset);
+	with out set, each result is also written as a JSON line the moment it arrives.
+	'''
+	jobs = [(preset, seed + i, max_ticks, pilot, num_enemies)
+			for pilot in pilot_names for preset in presets for i in range(matches)]
+	table = {}
+	# without out, the lines go to os.devnull
+	with open(out or os.devnull, "w") as log:
+		for n, result in enumerate(run_matches(jobs, processes)):
+			table.setdefault((result["pilot"], result["preset"]), []).append(result)
+			log.write(json.dumps(result) + "\n")
+			print("\r{}/{} matches".format(n + 1, len(jobs)), end="", flush=True)
+	print()
+	return table
+
+def print_table(table):
+	print("{:<10}{:<12}{:>8}{:>12}{:>14}{:>14}".format("pilot", "preset", "matches", "score", "survival (s)",
+														"best score"))
+	for (pilot, preset), runs in sorted(table.items()):
+		print("{:<10}{:<12}{:>8}{:>12.0f}{:>14.1f}{:>14}".format(
+			pilot, space_war_bench.preset_names[preset], len(runs), np.mean([r["high_score"] for r in runs]),
+			np.mean([r["survival_time"] for r in runs]), max(r["high_score"] for r in runs)))
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Headless AI-vs-AI tournament across a process pool")
+	parser.add_argument("presets", nargs="*", type=int, default=list(range(len(space_war.game_options))),
+						help="indexes into space_war.game_options (default: all)")
+	parser.add_argument("-p", "--pilots", nargs="+", choices=sorted(space_war_bench.pilots),
+						default=sorted(space_war_bench.pilots))
+	parser.add_argument("-n", "--matches", type=int, default=8, help="matches per pilot and preset")
+	parser.add_argument("-t", "--ticks", type=int, default=3000, help="longest match, in ticks")
+	parser.add_argument("-e", "--enemies", type=int, default=12)
+	parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes (default: one per core)")
+	parser.add_argument("-s", "--seed", type=int, default=0, help="seed of the first match; the rest count up")
+	parser.add_argument("-o", "--out", default=None, help="also write every result to this file as JSON lines")
+	args = parser.parse_args()
+
+	print_table(tournament(args.presets, args.pilots, args.matches, args.ticks, args.enemies, args.processes,
+						   args.seed, args.out))
@@ -1,10 +1,12 @@
 # Space War in pg
 # By Adam Kilbourne-Quirk 2020-02-25
 
-import os, sys, time, psutil
-import math, random
+import argparse
+import math, collections
 import pygame as pg
 
+import space_war
+
 '''
 Notes:
 co-ords from top left
@@ -19,108 +21,257 @@ Keycodes: http://thepythongamebook.com/en:glossary:p:pygame:keycodes
 How to rotate:
 https://kidscancode.org/blog/2016/08/pygame_shmup_part_6/
 
-
+Rotating a surface that was itself rotated grows and blurs it, so every rotation here starts from the unrotated
+image.
 '''
 
-# Initialisation
-pg.init()
-
 # Non-fullscreen mode is very slow on Mac
 FULLSCREEN = True
 
-if FULLSCREEN:
-    # flags only work in fullscreen
-    wn = pg.display.set_mode((1440, 900), pg.FULLSCREEN | pg.HWSURFACE | pg.DOUBLEBUF)
-else:
-    wn = pg.display.set_mode((800, 600), pg.RESIZABLE)
-
-pg.display.set_caption("Space War")
-
-background = pg.Surface(wn.get_size())
-background = background.convert()
-background.fill(pg.Color("gray"))
-
-
-class Actor:
-    def __init__(self, start_x, start_y, start_hdg=0, velocity=0, width=50, height=50, color=(255,255,255)):
-        self.x = start_x
-        self.y = start_y
-        self.hdg = start_hdg
-        self.w = width
-        self.h = height
-        self.color = color
-        self.vel = velocity
-
-        # alpha flag allows rotation
-        self.surf = pg.Surface((self.w, self.h)).convert()
-        #self.surf.fill(self.color)
-        C = (int(self.w / 2), int(self.h / 2))
-        r = int(self.w / 2)
-        pg.draw.polygon(self.surf, self.color, ((50, 50), (20, 40), (40, 20)))
-    def draw(self):
-        pass
-
-    def surface(self):
-        return self.surf
-
-    def get_rect(self):
-        return pg.Rect(self.x, self.y, self.w, self.h)
-
-    def rotate(self, angle):
-        # degrees
-        self.surf = pg.transform.rotate(self.surf, angle)
-
-
-    def move(self, keys):
-        if keys[pg.K_LEFT]:
-            self.x -= self.vel
-        if keys[pg.K_RIGHT]:
-            self.x += self.vel
-        if keys[pg.K_UP]:
-            self.y -= self.vel
-        if keys[pg.K_DOWN]:
-            self.y += self.vel
-        if keys[pg.K_r]:
-            self.rotate(45)
-
-        self.x = max(min(self.x, wn_x - self.w - b_offset), b_offset)
-        self.y = max(min(self.y, wn_y - self.h - b_offset), b_offset)
-
-def redraw():
-    pass
-actor = Actor(50, 50, 0, 10, 50, 50, pg.Color("cyan"))
-wn_x, wn_y = wn.get_size()
-b_offset = 10
-t = pg.time.Clock()
-for _ in vars(pg.key):
-    print(_)
-
-run = True
-while run:
-    pg.time.delay(1)
-
-    # Poll
-    keys = pg.key.get_pressed()
-    if keys[pg.K_ESCAPE]:
-        break
-    for event in pg.event.get():
-        if event.type == pg.QUIT:
-            run = False
-
-    # Update
-    actor.move(keys)
-
-    actor.draw()
-
-    # Draw, Back to Front
-    wn.blit(background, (0, 0))
-    wn.blit(actor.surface(), actor.get_rect())
-
-    # Show
-    pg.display.flip()
-
-    # Timing
-    t.tick()
-    #print(t.get_fps())
-
-pg.quit()
\ No newline at end of file
+# turtle's built-in shapes, pointing along +y like turtle's
+shape_polys = {
+    "classic": ((0, 0), (-5, -9), (0, -7), (5, -9)),
+    "arrow": ((-10, 0), (10, 0), (0, 10)),
+    "square": ((10, -10), (10, 10), (-10, 10), (-10, -10)),
+    "triangle": ((10, -5.77), (0, 11.55), (-10, -5.77)),
+    "circle": tuple((10 * math.cos(math.pi * k / 10), 10 * math.sin(math.pi * k / 10)) for k in range(20))
+}
+
+# turtle key names, as used by SpaceWar.get_key_actions, for each pygame key
+key_names = {
+    pg.K_LEFT: "Left",
+    pg.K_RIGHT: "Right",
+    pg.K_UP: "Up",
+    pg.K_DOWN: "Down",
+    pg.K_r: "r",
+    pg.K_z: "z",
+    pg.K_x: "x",
+    pg.K_SPACE: "space",
+    pg.K_a: "a",
+    pg.K_p: "p"
+}
+
+# the looks the game uses, as (shape, color, stretch), so their rotations can be drawn before play starts
+game_looks = ([("square", color, (1, 1)) for color in space_war.Enemy.color_dict.values()] +
+              [("triangle", color, (1, 1)) for color in ("cyan", "black")] +
+              [("triangle", "yellow", space_war.Bullet.stretch), ("circle", "magenta", space_war.Bullet.stretch),
+               ("circle", "white", (1, 1))])
+
+class RotationCache():
+    '''
+    Pre-rotated sprite images shared by every sprite, keyed by (shape, color, stretch, angle bucket) with one bucket
+    per angle_step degrees. Once warmed, drawing a sprite is a dictionary lookup. It holds at most max_images
+    rotations and drops the least recently used beyond that; each rotation is made from the unrotated image.
+    '''
+    def __init__(self, angle_step=5, max_images=4096):
+        self.angle_step = angle_step
+        self.buckets = round(360 / angle_step)
+        self.max_images = max_images
+        self.images = collections.OrderedDict()
+        self.bases = {}
+        self.hits = 0
+        self.misses = 0
+
+    def base(self, shape, color, stretch):
+        key = (shape, color, stretch)
+        base = self.bases.get(key)
+        if base is None:
+            stretch_wid, stretch_len = stretch
+            # stretch_len runs along the heading and stretch_wid across it; the base image points east
+            points = [(y * stretch_len, -x * stretch_wid) for x, y in shape_polys.get(shape, shape_polys["classic"])]
+            r = max(math.hypot(x, y) for x, y in points) + 1
+            base = self.bases[key] = pg.Surface((2 * r, 2 * r), pg.SRCALPHA)
+            pg.draw.polygon(base, pg.Color(color), [(x + r, y + r) for x, y in points])
+        return base
+
+    def get(self, shape, color, stretch, hdg):
+        key = (shape, color, stretch, round(hdg / self.angle_step) % self.buckets)
+        image = self.images.get(key)
+        if image is not None:
+            self.hits += 1
+            self.images.move_to_end(key)
+            return image
+        self.misses += 1
+        image = self.images[key] = pg.transform.rotate(self.base(shape, color, stretch),
+                                                       key[3] * self.angle_step).convert_alpha()
+        if len(self.images) > self.max_images:
+            self.images.popitem(last=False)
+        return image
+
+    def warm(self, looks):
+        for shape, color, stretch in looks:
+            for bucket in range(self.buckets):
+                self.get(shape, color, stretch, bucket * self.angle_step)
+        # warming isn't a miss during play
+        self.misses = 0
+
+class SpriteView(pg.sprite.DirtySprite):
+    '''
+    The on-screen stand-in for one game sprite. It is only marked dirty when its image, position or visibility
+    changed; where is passed on to get_rect to place the image.
+    '''
+    def __init__(self):
+        pg.sprite.DirtySprite.__init__(self)
+        self.image = pg.Surface((1, 1), pg.SRCALPHA)
+        self.rect = self.image.get_rect()
+        self.state = None
+
+    def show(self, state, image, visible=True, **where):
+        if state == self.state:
+            return
+        self.state = state
+        self.image = image
+        self.rect = image.get_rect(**where)
+        # setting visible marks the sprite dirty, even to the same value
+        if self.visible != visible:
+            self.visible = int(visible)
+        self.dirty = 1
+
+class PygameRenderer(space_war.Renderer):
+    '''
+    Draws the space_war game state with pygame. Sprite images come from a shared rotation cache, the stars and
+    walls are one static background surface, and only the screen areas that changed are pushed to the display each
+    frame. Like the turtle backend, views are recycled when their sprite goes away.
+    '''
+    def __init__(self, border_size_x=800, border_size_y=450, margin_x=20, margin_y=60):
+        pg.init()
+        self.width = 2 * (border_size_x + margin_x)
+        self.height = 2 * (border_size_y + margin_y)
+        if FULLSCREEN:
+            # SCALED keeps the arena's resolution and lets SDL fit it to the display
+            self.wn = pg.display.set_mode((self.width, self.height), pg.FULLSCREEN | pg.SCALED)
+        else:
+            self.wn = pg.display.set_mode((self.width, self.height))
+        pg.display.set_caption("Space War")
+
+        self.background = pg.Surface(self.wn.get_size()).convert()
+        self.background.fill(pg.Color("black"))
+        self.static_dirty = False
+        self.group = pg.sprite.LayeredDirty()
+        self.group.clear(self.wn, self.background)
+        self.rotations = RotationCache()
+        self.rotations.warm(game_looks)
+        self.views = {}
+        self.spare_views = []
+        self.text_views = {}
+        self.fonts = {}
+        self.aim_image = pg.Surface((3, 3)).convert()
+        self.aim_image.fill(pg.Color("white"))
+
+    def to_screen(self, x, y):
+        return round(x + self.width / 2), round(self.height / 2 - y)
+
+    def get_view(self, key):
+        view = self.views.get(key)
+        if view is None:
+            view = self.spare_views.pop() if self.spare_views else SpriteView()
+            view.state = None
+            self.views[key] = view
+            self.group.add(view)
+        return view
+
+    # stars and walls share one pre-rendered surface, rebuilt on the next frame after either changes
+    def draw_background(self, game):
+        self.static_dirty = True
+
+    def draw_walls(self, game):
+        self.static_dirty = True
+
+    def draw_static(self, game):
+        layer = space_war.rasterize_static_layer(game, lambda color: tuple(pg.Color(color))[:3])
+        surface = pg.surfarray.make_surface(layer.transpose(1, 0, 2)).convert()
+        self.background.fill(pg.Color("black"))
+        self.background.blit(surface, surface.get_rect(center=self.to_screen(0, 0)))
+        self.wn.blit(self.background, (0, 0))
+        self.group.repaint_rect(self.wn.get_rect())
+        self.static_dirty = False
+
+    def write_text(self, name, text, x, y, font_size):
+        font = self.fonts.get(font_size)
+        if font is None:
+            font = self.fonts[font_size] = pg.font.SysFont("Arial", font_size)
+        view = self.text_views.get(name)
+        if view is None:
+            view = self.text_views[name] = SpriteView()
+            self.group.add(view)
+        image = font.render(text.replace("\t", "    "), True, pg.Color("white"))
+        # turtle writes up and to the right of the pen
+        view.show((text, x, y, font_size), image, bottomleft=self.to_screen(x, y))
+
+    def draw(self, game, alpha=1):
+        if self.static_dirty:
+            self.draw_static(game)
+        live = set()
+        for sprite in game.actors + game.bullets.live():
+            live.add(sprite)
+            view = self.get_view(sprite)
+            x, y = sprite.lerp_pos(alpha)
+            pos = self.to_screen(x, y)
+            image = self.rotations.get(sprite.shape, sprite.current_color, sprite.stretch, sprite.heading())
+            view.show((pos, image, sprite.visible), image, sprite.visible, center=pos)
+
+        if game.options["show_aim_pts"]:
+            for actor in game.actors:
+                if isinstance(actor, space_war.Enemy):
+                    key = ("aim", actor)
+                    live.add(key)
+                    pos = self.to_screen(actor.ax, actor.ay)
+                    self.get_view(key).show((pos, self.aim_image), self.aim_image, center=pos)
+
+        # hand views of despawned sprites back to the pool
+        for key in [k for k in self.views if k not in live]:
+            view = self.views.pop(key)
+            self.group.remove(view)
+            self.spare_views.append(view)
+
+        pg.display.update(self.group.draw(self.wn))
+
+    def close(self):
+        pg.quit()
+
+def run(game, fps=60, max_catchup=5):
+    '''
+    Fixed-timestep loop paced by pygame's Clock: the simulation ticks at its clock's rate, drawing happens once per
+    Clock.tick(fps) and is interpolated between ticks. As in space_war.GameLoop, at most max_catchup ticks are run
+    after a slow frame.
+    '''
+    clock = pg.time.Clock()
+    tick_time = game.clock.tick_time
+    lag = 0
+    while game.active:
+        lag += clock.tick(fps) / 1000
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                game.exit_game()
+            elif event.type == pg.KEYDOWN:
+                if event.key in (pg.K_q, pg.K_ESCAPE):
+                    game.exit_game()
+                elif event.key == pg.K_d:
+                    game.dump_profile()
+                elif event.key in key_names:
+                    game.press(key_names[event.key])
+        if not game.active:
+            break
+
+        steps = 0
+        while lag >= tick_time and steps < max_catchup:
+            game.update()
+            lag -= tick_time
+            steps += 1
+        lag = min(lag, tick_time)
+        game.draw(lag / tick_time)
+        game.maf_frame_rate(clock.get_time() / 1000)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Space War through pygame")
+    parser.add_argument("preset", nargs="?", type=int, default=2, help="index into space_war.game_options")
+    parser.add_argument("enemies", nargs="?", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    game = space_war.new_game(space_war.game_options[args.preset], PygameRenderer(), args.enemies, seed=args.seed)
+    run(game)
+
+    print("\nStats:")
+    print("High Score: {}".format(game.highScore))
+    print("\nFrame Times (ms) and Counts:")
+    print(game.profiler.summary())
@@ -0,0 +1,296 @@
+# Space War snapshots
+# Fixed-layout binary frames of the whole game, appended to a replay file every tick and memory-mapped back, so long
+# recorded matches can be scrubbed and analysed without parsing or loading them.
+
+import os, time, argparse
+import json, struct
+import numpy as np
+
+import space_war
+import space_war_bench
+
+'''
+File layout. A replay is two files written side by side:
+
+path: magic, version and the length of a JSON header (seed, options, enemy count, tick time, arena size, walls, and
+	the palette and shapes the color and shape codes index), padded to a multiple of 8 bytes, then one frame_dtype
+	record per tick.
+path.bullets: the live bullets of every frame back to back as bullet_dtype records. A frame holds where its bullets
+	start and how many there are, so a frame stays the same size however many bullets are flying.
+
+Frames have a fixed size, so tick n is at a known offset: seeking is a multiplication and a field over any run of
+ticks (e.g. reader.frames["player"]["x"][a:b]) is a strided view of the mapped file. Sizes are little-endian and
+unpadded. Statuses are stored as the seconds they have left (0 when off) rather than the times they started.
+'''
+
+magic = b"SWREPLAY"
+version = 1
+prefix_format = struct.Struct("<8sII")
+
+player_dtype = np.dtype([("x", "<f4"), ("y", "<f4"), ("hdg", "<f4"), ("speed", "<f4"), ("lives", "<i2"),
+						 ("bombs", "<i2"), ("invuln_left", "<f4"), ("autopilot", "u1"), ("visible", "u1"),
+						 ("color", "u1"), ("shape", "u1")])
+prize_dtype = np.dtype([("x", "<f4"), ("y", "<f4"), ("visible", "u1")])
+enemy_dtype = np.dtype([("x", "<f4"), ("y", "<f4"), ("hdg", "<f4"), ("speed", "<f4"), ("guidance", "u1"),
+						("scatter_left", "<f4"), ("visible", "u1"), ("color", "u1"), ("shape", "u1")])
+bullet_dtype = np.dtype([("slot", "<u2"), ("x", "<f4"), ("y", "<f4"), ("hdg", "<f4"), ("speed", "<f4"),
+						 ("bounces", "<i2"), ("age", "<f4"), ("color", "u1"), ("shape", "u1")])
+
+def frame_dtype(num_enemies):
+	return np.dtype([("tick", "<u4"), ("time", "<f8"), ("score", "<i4"), ("high_score", "<i4"), ("resets", "<u2"),
+					 ("bullet_start", "<u8"), ("bullet_count", "<u2"), ("player", player_dtype),
+					 ("prize", prize_dtype), ("enemies", enemy_dtype, (num_enemies,))])
+
+def header_info(game, enemies):
+	return {"seed": game.seed, "options": game.options, "num_enemies": len(enemies),
+			"tick_time": game.clock.tick_time, "border": [game.border_size_x, game.border_size_y],
+			"walls": [[wall.x1, wall.y1, wall.x2, wall.y2, wall.bounce_mode] for wall in game.walls],
+			"palette": space_war.palette, "shapes": space_war.shapes}
+
+class ReplayWriter():
+	'''
+	Appends a frame of game to path, and its bullets to path.bullets, each time write() is called; call it once per
+	tick, after update(). The arrays for a frame are allocated once and refilled, and writes go through the file
+	buffers, so recording costs one fill and two small writes per tick.
+	'''
+	def __init__(self, path, game):
+		self.game = game
+		self.enemies = [actor for actor in game.actors if isinstance(actor, space_war.Enemy)]
+		self.frame = np.zeros(1, frame_dtype(len(self.enemies)))
+		self.bullets = np.zeros(game.bullets.capacity, bullet_dtype)
+		self.bullet_start = 0
+		self.frames = 0
+		info = json.dumps(header_info(game, self.enemies)).encode()
+		self.file = open(path, "wb")
+		self.file.write(prefix_format.pack(magic, version, len(info)) + info)
+		self.file.write(bytes(-(prefix_format.size + len(info)) % 8))
+		self.bullet_file = open(path + ".bullets", "wb")
+
+	def write(self):
+		game = self.game
+		now = game.clock.time()
+		frame = self.frame[0]
+		frame["tick"] = game.clock.ticks
+		frame["time"] = now
+		frame["score"] = game.score
+		frame["high_score"] = game.highScore
+		frame["resets"] = game.resets
+
+		player = game.player
+		frame["player"] = (player.x, player.y, player.hdg, player.speed, player.lives, player.bombs,
+						   player.time_since_invuln + player.time_invuln - now if player.is_invuln else 0,
+						   player.on_autopilot, player.visible, space_war.color_index.get(player.current_color, 0),
+						   space_war.shape_index.get(player.shape, 0))
+		prize = game.prize
+		frame["prize"] = (prize.x, prize.y, prize.visible)
+		if self.enemies:
+			frame["enemies"] = [(e.x, e.y, e.hdg, e.speed, e.guidance,
+								 e.time_since_scatter + e.time_scatter - now if e.scattered else 0, e.visible,
+								 space_war.color_index.get(e.current_color, 0), space_war.shape_index.get(e.shape, 0))
+								for e in self.enemies]
+
+		pool = game.bullets
+		slots = np.flatnonzero(pool.active)
+		n = len(slots)
+		bullets = self.bullets[:n]
+		bullets["slot"] = slots
+		for name in ("x", "y", "hdg", "speed", "bounces"):
+			bullets[name] = getattr(pool, name)[slots]
+		bullets["age"] = now - pool.spawn_time[slots]
+		handles = [pool.handles[i] for i in slots.tolist()]
+		bullets["color"] = [space_war.color_index.get(b.current_color, 0) for b in handles]
+		bullets["shape"] = [space_war.shape_index.get(b.shape, 0) for b in handles]
+		frame["bullet_start"] = self.bullet_start
+		frame["bullet_count"] = n
+		self.bullet_start += n
+
+		self.bullet_file.write(bullets.tobytes())
+		self.file.write(self.frame.tobytes())
+		self.frames += 1
+
+	def close(self):
+		self.file.close()
+		self.bullet_file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+def map_records(path, dtype, offset=0):
+	# np.memmap refuses empty files, and a replay stopped early can end partway through a record
+	count = (os.path.getsize(path) - offset) // dtype.itemsize
+	if count == 0:
+		return np.zeros(0, dtype)
+	return np.memmap(path, dtype, "r", offset, (count,))
+
+class ReplayReader():
+	'''
+	Memory-maps a replay. Nothing past the header is read until it's used: frames is an array of every frame and
+	bullets of every bullet record, both backed by the files, and slicing either gives views, not copies. Color and
+	shape codes index palette and shapes, read from the file's header. Frames written after the reader was opened
+	show up after refresh().
+	'''
+	def __init__(self, path):
+		self.path = path
+		with open(path, "rb") as f:
+			tag, file_version, size = prefix_format.unpack(f.read(prefix_format.size))
+			if tag != magic or file_version != version:
+				raise ValueError("{} is not a version {} space_war replay".format(path, version))
+			self.info = json.loads(f.read(size))
+		self.offset = prefix_format.size + size + -(prefix_format.size + size) % 8
+		self.dtype = frame_dtype(self.info["num_enemies"])
+		# the codes as they were when the file was written
+		self.palette = self.info["palette"]
+		self.shapes = self.info["shapes"]
+		self.refresh()
+
+	def refresh(self):
+		self.frames = map_records(self.path, self.dtype, self.offset)
+		self.bullets = map_records(self.path + ".bullets", bullet_dtype)
+		self.first_tick = int(self.frames["tick"][0]) if len(self.frames) else 0
+
+	def __len__(self):
+		return len(self.frames)
+
+	def index(self, tick):
+		'''
+		Position of tick in frames. Frames are written one per tick, so this is a subtraction.
+		'''
+		i = tick - self.first_tick
+		if not 0 <= i < len(self.frames) or self.frames["tick"][i] != tick:
+			raise KeyError(tick)
+		return i
+
+	def frame(self, tick):
+		'''
+		The frame of tick and a view of its bullets.
+		'''
+		frame = self.frames[self.index(tick)]
+		start = int(frame["bullet_start"])
+		return frame, self.bullets[start:start + int(frame["bullet_count"])]
+
+	def window(self, start, stop):
+		'''
+		Views of the frames from tick start up to stop and of all their bullets. Each frame's bullets are at its
+		bullet_start, less that of the first frame, in the returned bullets. An empty window gives empty views.
+		'''
+		if start >= stop:
+			return self.frames[:0], self.bullets[:0]
+		i, j = self.index(start), self.index(stop - 1) + 1
+		frames = self.frames[i:j]
+		first = int(frames["bullet_start"][0])
+		last = int(frames["bullet_start"][-1] + frames["bullet_count"][-1])
+		return frames, self.bullets[first:last]
+
+	def close(self):
+		# numpy closes a memmap's file when the last view of it goes
+		self.frames = self.bullets = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+def record_match(path, preset, max_ticks, pilot_name="auto", num_enemies=12, seed=0):
+	'''
+	Plays a headless match as space_war_bench does, writing every tick to a replay at path.
+	'''
+	game = space_war.new_game(space_war.game_options[preset], num_enemies=num_enemies, seed=seed)
+	pilot = space_war_bench.pilots[pilot_name](seed)
+	with ReplayWriter(path, game) as writer:
+		while game.clock.ticks < max_ticks:
+			pilot.act(game)
+			game.update()
+			writer.write()
+	return game
+
+def convert_log(path, log):
+	'''
+	Replays an InputRecorder log (space_war.py --record) into a replay at path.
+	'''
+	writers = []
+	def write(game):
+		# replay makes the game, so the writer starts with the first tick
+		if not writers:
+			writers.append(ReplayWriter(path, game))
+		writers[0].write()
+
+	try:
+		return space_war.replay(log, on_tick=write)
+	finally:
+		for writer in writers:
+			writer.close()
+
+def summarize(path, seeks=1000, seed=0):
+	'''
+	Opens the replay at path and times random seeks and a pass over every frame, the kind of scan offline analysis
+	does.
+	'''
+	t = time.perf_counter()
+	reader = ReplayReader(path)
+	open_time = time.perf_counter() - t
+	size = os.path.getsize(path) + os.path.getsize(path + ".bullets")
+	report = dict.fromkeys(("frames", "bullet_records", "bytes_per_frame", "seek_us", "scan_ms", "mean_player_speed",
+							"peak_bullets"), 0)
+	report.update(bytes=size, open_us=open_time * 1e6)
+	if len(reader) == 0:
+		# nothing to seek to or scan
+		reader.close()
+		return report
+
+	rng = np.random.default_rng(seed)
+	ticks = rng.integers(reader.first_tick, reader.first_tick + len(reader), size=seeks)
+	t = time.perf_counter()
+	for tick in ticks.tolist():
+		frame, bullets = reader.frame(tick)
+		float(frame["player"]["x"])
+		len(bullets)
+	seek_time = (time.perf_counter() - t) / seeks
+
+	t = time.perf_counter()
+	player = reader.frames["player"]
+	speed = np.abs(player["speed"]).mean()
+	peak_bullets = int(reader.frames["bullet_count"].max())
+	scan_time = time.perf_counter() - t
+
+	report.update({
+		"frames": len(reader),
+		"bullet_records": len(reader.bullets),
+		"bytes_per_frame": size / len(reader),
+		"seek_us": seek_time * 1e6,
+		"scan_ms": scan_time * 1e3,
+		"mean_player_speed": float(speed),
+		"peak_bullets": peak_bullets
+	})
+	reader.close()
+	return report
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Record a headless match to a replay file and time reading it back")
+	parser.add_argument("path", help="replay file; its bullets go to path.bullets")
+	parser.add_argument("preset", nargs="?", type=int, default=2, help="index into space_war.game_options")
+	parser.add_argument("-t", "--ticks", type=int, default=3000, help="ticks to record")
+	parser.add_argument("-p", "--pilot", choices=sorted(space_war_bench.pilots), default="auto")
+	parser.add_argument("-e", "--enemies", type=int, default=12)
+	parser.add_argument("-s", "--seed", type=int, default=0)
+	parser.add_argument("-l", "--log", default=None, help="convert this --record input log instead of playing a match")
+	parser.add_argument("--read", action="store_true", help="only time reading an existing replay")
+	args = parser.parse_args()
+
+	if not args.read:
+		t = time.perf_counter()
+		if args.log:
+			game = convert_log(args.path, space_war.InputRecorder.load(args.log))
+		else:
+			game = record_match(args.path, args.preset, args.ticks, args.pilot, args.enemies, args.seed)
+		t = time.perf_counter() - t
+		print("recorded {} ticks in {:.2f} s ({:.0f} ticks/s)".format(game.clock.ticks, t, game.clock.ticks / t))
+	r = summarize(args.path)
+	print("{} frames, {} bullet records, {:.1f} MB ({:.0f} bytes/frame)".format(
+		r["frames"], r["bullet_records"], r["bytes"] / 1e6, r["bytes_per_frame"]))
+	print("open: {:.0f} us  random seek: {:.1f} us  scan of every frame: {:.1f} ms".format(
+		r["open_us"], r["seek_us"], r["scan_ms"]))
+	print("mean player speed {:.2f}, peak bullets {}".format(r["mean_player_speed"], r["peak_bullets"]))
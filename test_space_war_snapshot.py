@@ -0,0 +1,33 @@
+import space_war
+import space_war_snapshot
+
+def record(path, ticks):
+	return space_war_snapshot.record_match(str(path), 2, ticks, "random", num_enemies=4, seed=1)
+
+def test_empty_window(tmp_path):
+	path = tmp_path / "match.swr"
+	record(path, 30)
+	with space_war_snapshot.ReplayReader(str(path)) as reader:
+		frames, bullets = reader.window(10, 10)
+		assert len(frames) == 0 and len(bullets) == 0
+		frames, bullets = reader.window(20, 10)
+		assert len(frames) == 0 and len(bullets) == 0
+
+def test_summarize_empty_replay(tmp_path):
+	path = tmp_path / "empty.swr"
+	record(path, 0)
+	report = space_war_snapshot.summarize(str(path))
+	assert report["frames"] == 0
+	assert report["peak_bullets"] == 0
+	assert report["bytes"] > 0
+
+def test_frames_match_game(tmp_path):
+	path = tmp_path / "match.swr"
+	game = record(path, 60)
+	with space_war_snapshot.ReplayReader(str(path)) as reader:
+		assert len(reader) == 60
+		frame, bullets = reader.frame(60)
+		assert frame["score"] == game.score
+		assert abs(frame["player"]["x"] - game.player.x) < 1e-3
+		assert len(bullets) == len(game.bullets)
+		assert reader.palette == space_war.palette